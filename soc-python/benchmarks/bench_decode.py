@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Packets per second for the scapy and struct decoders, with and without rule evaluation."""
+import os
+import sys
+import random
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scapy.layers.l2 import Ether, Dot1Q
+from scapy.layers.inet import IP, TCP, UDP, ICMP
+from scapy.packet import Raw
+
+from modules import ids
+from modules.decode import decode_frame, build_bpf_filter
+
+FIELDS = ("src_ip", "dst_ip", "src_port", "dst_port", "protocol", "length", "flags", "payload_preview")
+
+
+def make_frames(count: int) -> list[bytes]:
+    rng = random.Random(0)
+    frames = []
+    for _ in range(count):
+        ip = IP(src=f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}", dst=f"192.168.1.{rng.randint(1, 254)}")
+        kind = rng.random()
+        if kind < 0.6:
+            l4 = TCP(sport=rng.randint(1024, 65535), dport=rng.choice([22, 80, 443, 8080, rng.randint(1, 65535)]),
+                     flags=rng.choice(["S", "SA", "A", "PA", "FA"]))
+        elif kind < 0.9:
+            l4 = UDP(sport=rng.randint(1024, 65535), dport=rng.choice([53, 123, 5353, rng.randint(1, 65535)]))
+        else:
+            l4 = ICMP()
+        pkt = Ether() / ip / l4 / Raw(os.urandom(rng.choice([0, 32, 512, 1400])))
+        if rng.random() < 0.05:
+            pkt = Ether() / Dot1Q(vlan=10) / ip / l4
+        frames.append(bytes(pkt))
+    return frames
+
+
+def scapy_decode(frame: bytes):
+    return ids._scapy_packet_info(Ether(frame))
+
+
+def fast_decode(frame: bytes):
+    return decode_frame(frame)
+
+
+def main():
+    frames = make_frames(5000)
+    for frame in frames[:1000]:
+        a, b = scapy_decode(frame), fast_decode(frame)
+        assert [a[k] for k in FIELDS] == [b[k] for k in FIELDS], (a, b)
+
+    passed = sum(1 for f in frames if ids._check_rules(fast_decode(f)))
+    print(f"BPF filter: {build_bpf_filter(ids.IDS_RULES)}")
+    print(f"frames reaching userspace with filter: {passed / len(frames):.0%}\n")
+
+    now = time.time()
+    print(f"{'mode':>8} {'decode pps':>12} {'decode+rules pps':>17}")
+    for name, decode in (("scapy", scapy_decode), ("fast", fast_decode)):
+        reps = 3 if name == "scapy" else 10
+        plain = min(timeit.repeat(lambda: [decode(f) for f in frames], number=1, repeat=reps))
+        full = min(timeit.repeat(lambda: [ids._evaluate(decode(f), now) for f in frames], number=1, repeat=reps))
+        print(f"{name:>8} {len(frames) / plain:>12,.0f} {len(frames) / full:>17,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Compare the compiled IDS rule index with a linear scan over IDS_RULES."""
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import ids
+
+
+def linear_scan(rules: list[dict], pkt_info: dict) -> list[dict]:
+    triggered = []
+    for rule in rules:
+        if rule["proto"] and rule["proto"] != pkt_info.get("protocol"):
+            continue
+        if rule["dst_port"] and rule["dst_port"] != pkt_info.get("dst_port"):
+            continue
+        if rule["flags"] and rule["flags"] not in (pkt_info.get("flags") or ""):
+            continue
+        triggered.append(rule)
+    return triggered
+
+
+def make_rules(n: int) -> list[dict]:
+    rng = random.Random(n)
+    rules = list(ids.IDS_RULES[:n])
+    while len(rules) < n:
+        proto = rng.choice(["TCP", "UDP", None])
+        rules.append({
+            "id": f"B{len(rules):05d}", "name": "bench", "proto": proto,
+            "dst_port": rng.randint(1, 65535) if rng.random() < 0.95 else None,
+            "flags": "S" if proto == "TCP" and rng.random() < 0.1 else None,
+            "severity": "info", "category": "bench",
+        })
+    return rules
+
+
+def make_packets(count: int) -> list[dict]:
+    rng = random.Random(0)
+    packets = []
+    for _ in range(count):
+        proto = rng.choice(["TCP", "TCP", "UDP", "ICMP"])
+        packets.append({
+            "protocol": proto,
+            "dst_port": rng.choice([22, 53, 80, 443, 3389, rng.randint(1, 65535)]) if proto != "ICMP" else None,
+            "flags": rng.choice(["S", "SA", "A", "PA"]) if proto == "TCP" else None,
+        })
+    return packets
+
+
+def main():
+    packets = make_packets(1000)
+    print(f"{'rules':>8} {'linear us/pkt':>14} {'indexed us/pkt':>15} {'speedup':>8}")
+    for n in (10, 1000, 10000):
+        rules = make_rules(n)
+        ids.load_rules(rules)
+        for pkt in packets:
+            assert [r["id"] for r in ids._check_rules(pkt)] == [r["id"] for r in linear_scan(rules, pkt)]
+        reps = 3 if n >= 10000 else 10
+        linear = min(timeit.repeat(lambda: [linear_scan(rules, p) for p in packets], number=1, repeat=reps))
+        indexed = min(timeit.repeat(lambda: [ids._check_rules(p) for p in packets], number=1, repeat=reps))
+        print(f"{n:>8} {linear / len(packets) * 1e6:>14.2f} {indexed / len(packets) * 1e6:>15.2f} {linear / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,62 @@
-import json
-from modules.database import get_conn
-
-
-def get_all_assets(page: int = 1, page_size: int = 50) -> dict:
-    conn = get_conn()
-    total = conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
-    offset = (page - 1) * page_size
-    rows = conn.execute(
-        "SELECT * FROM assets ORDER BY last_seen DESC LIMIT ? OFFSET ?",
-        (page_size, offset)
-    ).fetchall()
-    conn.close()
-    assets = []
-    for r in rows:
-        a = dict(r)
-        try:
-            a["open_ports"] = json.loads(a["open_ports"] or "[]")
-        except Exception:
-            a["open_ports"] = []
-        assets.append(a)
-    return {"total": total, "assets": assets}
+from modules.database import connection, keyset_page, count_rows, read_counters
+from modules import cache
 
+PORT_COLUMNS = "port, protocol, service, version, first_seen, last_seen"
 
-def get_asset(ip: str) -> dict | None:
-    conn = get_conn()
-    row = conn.execute("SELECT * FROM assets WHERE ip_address=?", (ip,)).fetchone()
-    conn.close()
-    if not row:
-        return None
-    a = dict(row)
-    try:
-        a["open_ports"] = json.loads(a["open_ports"] or "[]")
-    except Exception:
+
+def _attach_ports(conn, assets: list[dict]) -> list[dict]:
+    by_id = {a["id"]: a for a in assets}
+    for a in assets:
         a["open_ports"] = []
-    return a
+    ids = list(by_id)
+    for i in range(0, len(ids), 500):
+        part = ids[i:i + 500]
+        for r in conn.execute(f"SELECT asset_id, {PORT_COLUMNS} FROM asset_ports "
+                              f"WHERE asset_id IN ({','.join('?' * len(part))}) ORDER BY asset_id, port", part):
+            p = dict(r)
+            by_id[p.pop("asset_id")]["open_ports"].append(p)
+    return assets
+
+
+def get_all_assets(page: int = 1, page_size: int = 50, cursor: str = None, total: str = "approx",
+                   port: int = None, service: str = None, os_name: str = None) -> dict:
+    conditions = ["1=1"]
+    params = []
+    if port:
+        conditions.append("id IN (SELECT asset_id FROM asset_ports WHERE port=?)")
+        params.append(int(port))
+    if service:
+        conditions.append("id IN (SELECT asset_id FROM asset_ports WHERE service=?)")
+        params.append(service)
+    if os_name:
+        escaped = os_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("os_info LIKE ? ESCAPE '\\'")
+        params.append(escaped + "%")
+    where = " AND ".join(conditions)
+    with connection() as conn:
+        count = count_rows(conn, "assets", where, params, total)
+        result = keyset_page(conn, f"SELECT * FROM assets WHERE {where}", params,
+                             ("last_seen", "id"), page_size, cursor, offset=(page - 1) * page_size)
+        assets = _attach_ports(conn, result["rows"])
+    return {"total": count, "assets": assets, "next": result["next"], "prev": result["prev"]}
+
+
+def get_asset(ip: str) -> dict | None:
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM assets WHERE ip_address=?", (ip,)).fetchone()
+        if not row:
+            return None
+        return _attach_ports(conn, [dict(row)])[0]
 
 
 def delete_asset(ip: str):
-    conn = get_conn()
-    conn.execute("DELETE FROM assets WHERE ip_address=?", (ip,))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("DELETE FROM assets WHERE ip_address=?", (ip,))
+    cache.bump("assets")
 
 
 def get_asset_stats() -> dict:
-    conn = get_conn()
-    total = conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
-    up = conn.execute("SELECT COUNT(*) FROM assets WHERE status='up'").fetchone()[0]
-    down = conn.execute("SELECT COUNT(*) FROM assets WHERE status='down'").fetchone()[0]
-    conn.close()
-    return {"total": total, "up": up, "down": down}
+    with connection() as conn:
+        counters = read_counters(conn, "assets")
+    status = counters.get("status", {})
+    return {"total": counters.get("total", {}).get(None, 0), "up": status.get("up", 0), "down": status.get("down", 0)}
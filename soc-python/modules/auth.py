@@ -1,16 +1,94 @@
 import bcrypt
 import jwt
 import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from functools import wraps
 from flask import request, jsonify, session
-from modules.database import get_conn
+from modules.database import connection
 from modules.config import load_config
 
+TOKEN_CACHE_SIZE = 1024
+LOGIN_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+LOGIN_QUEUE = 16
+LOGIN_QUEUE_TIMEOUT = 5.0
+THROTTLE_PRUNE_INTERVAL = 300
+STREAM_TICKET_TTL = 600
+
+_login_pool = ThreadPoolExecutor(max_workers=LOGIN_WORKERS, thread_name_prefix="bcrypt")
+_login_slots = threading.BoundedSemaphore(LOGIN_WORKERS + LOGIN_QUEUE)
+_throttle_pruned = 0.0
+
+_token_cache = OrderedDict()
+_token_lock = threading.Lock()
+
 
 def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+def verify_password_bounded(plain: str, hashed: str, timeout: float = LOGIN_QUEUE_TIMEOUT) -> bool | None:
+    """bcrypt check on the login pool. Returns None when the pool is saturated or the wait times out."""
+    deadline = time.monotonic() + timeout
+    if not _login_slots.acquire(timeout=timeout):
+        return None
+    try:
+        future = _login_pool.submit(verify_password, plain, hashed)
+    except Exception:
+        _login_slots.release()
+        raise
+    future.add_done_callback(lambda _: _login_slots.release())
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        future.cancel()
+        return None
+
+
+def _take_token(conn, key: str, per_minute: float, now: float) -> float:
+    rate = per_minute / 60
+    row = conn.execute("SELECT tokens, updated FROM login_throttle WHERE key=?", (key,)).fetchone()
+    tokens = per_minute if row is None else min(per_minute, row[0] + (now - row[1]) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate if rate else float("inf")
+    conn.execute("""INSERT INTO login_throttle (key, tokens, updated) VALUES (?,?,?)
+                    ON CONFLICT(key) DO UPDATE SET tokens=excluded.tokens, updated=excluded.updated""",
+                 (key, tokens - 1, now))
+    return 0.0
+
+
+def check_login_rate(username: str, remote_addr: str) -> float:
+    """Charge one attempt to the IP and user buckets; returns seconds to wait, 0 when allowed.
+
+    Buckets live in SQLite so every API worker process draws from the same budget.
+    """
+    global _throttle_pruned
+    cfg = load_config()
+    now = time.time()
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if now - _throttle_pruned > THROTTLE_PRUNE_INTERVAL:
+            _throttle_pruned = now
+            # A bucket untouched for an hour has refilled completely; dropping it changes nothing.
+            conn.execute("DELETE FROM login_throttle WHERE updated < ?", (now - 3600,))
+        wait = _take_token(conn, f"ip:{remote_addr or ''}",
+                           float(cfg.get("login_attempts_per_minute_ip", 20)), now)
+        if not wait:
+            wait = _take_token(conn, f"user:{username.lower()}",
+                               float(cfg.get("login_attempts_per_minute_user", 5)), now)
+    return wait
+
+
+def login_pool_status() -> dict:
+    with connection() as conn:
+        throttled = conn.execute("SELECT count(*) FROM login_throttle WHERE tokens < 1").fetchone()[0]
+    return {"workers": LOGIN_WORKERS, "queue": LOGIN_QUEUE,
+            "free_slots": _login_slots._value, "throttled_keys": throttled}
+
+
 def hash_password(plain: str) -> str:
     return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
 
@@ -18,7 +96,7 @@ def hash_password(plain: str) -> str:
 def generate_token(user_id: int, username: str, role: str) -> str:
     cfg = load_config()
     payload = {
-        "sub": user_id,
+        "sub": str(user_id),
         "username": username,
         "role": role,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=8),
@@ -26,12 +104,40 @@ def generate_token(user_id: int, username: str, role: str) -> str:
     return jwt.encode(payload, cfg["secret_key"], algorithm="HS256")
 
 
+def generate_stream_ticket(user: dict) -> str:
+    """Short-lived token that only opens the event stream (it travels in a URL)."""
+    payload = {
+        "sub": str(user.get("sub", "")),
+        "username": user.get("username"),
+        "scope": "stream",
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=STREAM_TICKET_TTL),
+    }
+    return jwt.encode(payload, load_config()["secret_key"], algorithm="HS256")
+
+
+def verify_stream_ticket(ticket: str) -> dict | None:
+    payload = decode_token(ticket) if ticket else None
+    return payload if payload and payload.get("scope") == "stream" else None
+
+
 def decode_token(token: str) -> dict | None:
-    cfg = load_config()
+    key = (load_config()["secret_key"], token)
+    with _token_lock:
+        payload = _token_cache.get(key)
+        if payload is not None:
+            if payload.get("exp", 0) > time.time():
+                _token_cache.move_to_end(key)
+                return dict(payload)
+            del _token_cache[key]
     try:
-        return jwt.decode(token, cfg["secret_key"], algorithms=["HS256"])
+        payload = jwt.decode(token, key[0], algorithms=["HS256"], options={"require": ["exp"]})
     except Exception:
         return None
+    with _token_lock:
+        _token_cache[key] = payload
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return dict(payload)
 
 
 def login_required(f):
@@ -49,7 +155,7 @@ def login_required(f):
             from flask import redirect, url_for
             return redirect(url_for("ui.login_page"))
         payload = decode_token(token)
-        if not payload:
+        if not payload or payload.get("scope") == "stream":
             if request.is_json:
                 return jsonify({"error": "Invalid token"}), 401
             from flask import redirect, url_for
@@ -60,7 +166,6 @@ def login_required(f):
 
 
 def get_user(username: str) -> dict | None:
-    conn = get_conn()
-    row = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
     return dict(row) if row else None
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, Response
+from modules import config, database
+
+CACHE_TTL = 5
+MAX_ENTRIES = 200
+
+# Version stamps are files under data/versions so every process (gunicorn
+# workers, the launcher, soc_import) sees a write without querying SQLite.
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "bumps": 0}
+
+
+def _version_path(table: str) -> str:
+    if table == "config":
+        return config.CONFIG_PATH
+    return os.path.join(database.DATA_DIR, "versions", table)
+
+
+def version(table: str) -> str:
+    try:
+        st = os.stat(_version_path(table))
+    except OSError:
+        return "0"
+    return f"{st.st_ino:x}.{st.st_mtime_ns:x}"
+
+
+def bump(*tables: str):
+    """Mark tables as written; cached responses and ETags built on them go stale."""
+    for table in tables:
+        path = _version_path(table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp, path)
+        _stats["bumps"] += 1
+
+
+def cached(*tables: str, ttl: float = CACHE_TTL, key=None):
+    """Cache a GET view's 200 response for ttl seconds or until one of tables is bumped.
+
+    The ETag is derived from the view, the request path and the table versions
+    alone, so a matching If-None-Match is answered with 304 before the view runs
+    for as long as nothing is written; ttl only bounds how long the body is kept.
+    Views whose output also depends on something else (e.g. the current day)
+    pass key, a callable whose result is mixed into the ETag.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            stamp = "|".join([f.__name__, request.full_path, key() if key else ""] +
+                             [version(t) for t in tables])
+            etag = hashlib.sha1(stamp.encode()).hexdigest()[:20]
+            if etag in request.if_none_match:
+                _stats["not_modified"] += 1
+                return _headers(Response(status=304), etag)
+            now = time.monotonic()
+            with _lock:
+                hit = _entries.get(etag)
+                if hit and hit[2] <= now:
+                    del _entries[etag]
+                    hit = None
+                elif hit:
+                    _entries.move_to_end(etag)
+            if hit:
+                _stats["hits"] += 1
+                return _headers(Response(hit[0], mimetype=hit[1]), etag)
+            _stats["misses"] += 1
+            resp = make_response(f(*args, **kwargs))
+            if resp.status_code != 200 or resp.is_streamed:
+                return resp
+            with _lock:
+                _entries[etag] = (resp.get_data(), resp.mimetype, now + ttl)
+                while len(_entries) > MAX_ENTRIES:
+                    _entries.popitem(last=False)
+            return _headers(resp, etag)
+        return wrapper
+    return decorator
+
+
+def _headers(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def stats() -> dict:
+    return {"entries": len(_entries), "ttl": CACHE_TTL, **_stats}
@@ -1,5 +1,7 @@
 import os
 import json
+import time
+import threading
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -7,29 +9,69 @@ UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 DB_PATH = os.path.join(DATA_DIR, "soc.db")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
 
+CONFIG_STAT_INTERVAL = 1.0
+
+_config_cache = None
+_config_checked = 0.0
+_config_lock = threading.Lock()
+
 DEFAULT_CONFIG = {
     "secret_key": "soc-platform-secret-change-me",
+    "login_attempts_per_minute_ip": 20,
+    "login_attempts_per_minute_user": 5,
+    "stream_port": 5001,
+    "stream_public_url": "",
     "network_range": "192.168.1.0/24",
     "scan_type": "standard",
     "scan_interval_minutes": 15,
     "auto_scan_enabled": False,
+    "scan_workers": 4,
+    "scan_chunk_prefix": 24,
+    "scan_deep_budget": 16,
     "interface": "eth0",
     "home_net": "192.168.0.0/16,10.0.0.0/8,172.16.0.0/12",
     "ids_mode": "ids",
+    "capture_filter": "auto",
+    "capture_decoder": "scapy",
+    "capture_workers": 0,
+    "packet_store_mode": "all",
+    "packet_sample_rate": 100,
+    "flow_tracking": True,
+    "flow_idle_timeout": 15,
+    "flow_active_timeout": 1800,
+    "retention_packets_hours": 24,
+    "retention_flows_days": 7,
+    "retention_logs_days": 30,
+    "retention_alerts_days": 90,
+    "retention_interval_minutes": 60,
+    "packet_queue_size": 10000,
+    "packet_batch_size": 500,
+    "packet_flush_ms": 250,
+    "alert_dedup_window_seconds": 300,
     "alert_on_new_host": True,
     "alert_on_port_change": True,
     "telegram_token": "",
     "telegram_chat_id": "",
     "telegram_min_severity": "high",
+    "telegram_rate_per_minute": 20,
     "twilio_sid": "",
     "twilio_token": "",
     "twilio_from": "",
     "twilio_to": "",
     "whatsapp_min_severity": "high",
+    "whatsapp_rate_per_minute": 10,
 }
 
 
-def load_config() -> dict:
+def _config_stamp() -> tuple | None:
+    try:
+        st = os.stat(CONFIG_PATH)
+    except OSError:
+        return None
+    return CONFIG_PATH, st.st_mtime_ns, st.st_size
+
+
+def _read_config() -> dict:
     os.makedirs(DATA_DIR, exist_ok=True)
     if os.path.exists(CONFIG_PATH):
         try:
@@ -40,7 +82,27 @@ def load_config() -> dict:
     return DEFAULT_CONFIG.copy()
 
 
+def load_config() -> dict:
+    """Return a copy of the config, re-reading the file only when its mtime/size changes."""
+    global _config_cache, _config_checked
+    now = time.monotonic()
+    cached = _config_cache
+    if cached and now - _config_checked < CONFIG_STAT_INTERVAL:
+        return cached[1].copy()
+    stamp = _config_stamp()
+    with _config_lock:
+        if _config_cache is None or _config_cache[0] != stamp or stamp is None:
+            _config_cache = (stamp, _read_config())
+        _config_checked = now
+        return _config_cache[1].copy()
+
+
 def save_config(cfg: dict):
+    global _config_cache
     os.makedirs(DATA_DIR, exist_ok=True)
-    with open(CONFIG_PATH, "w") as f:
+    tmp = f"{CONFIG_PATH}.tmp"
+    with open(tmp, "w") as f:
         json.dump(cfg, f, indent=2)
+    os.replace(tmp, CONFIG_PATH)
+    with _config_lock:
+        _config_cache = None
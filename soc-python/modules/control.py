@@ -0,0 +1,76 @@
+import os
+import threading
+from functools import wraps
+from flask import request, jsonify, Response
+
+# "all": one process serves the API and runs capture/scanner/maintenance.
+# "api": a gunicorn worker; stateful endpoints are forwarded to the launcher.
+ROLE = os.environ.get("SOC_ROLE", "all")
+CONTROL_URL = os.environ.get("SOC_CONTROL_URL", "").rstrip("/")
+PROXY_TIMEOUT = 300
+STREAM_CHUNK = 65536
+
+FORWARD_HEADERS = ("Authorization", "Cookie", "Content-Type", "Content-Length", "Accept", "If-None-Match")
+RETURN_HEADERS = ("Content-Type", "Retry-After", "ETag", "Cache-Control", "Set-Cookie")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def is_api_worker() -> bool:
+    return ROLE == "api" and bool(CONTROL_URL)
+
+
+def _http():
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            _client = httpx.Client(base_url=CONTROL_URL, timeout=PROXY_TIMEOUT)
+        return _client
+
+
+def _headers() -> dict:
+    return {h: request.headers[h] for h in FORWARD_HEADERS if h in request.headers}
+
+
+def forward():
+    """Replay the current request against the launcher's control server."""
+    import httpx
+    body = iter(lambda: request.stream.read(STREAM_CHUNK), b"") if request.content_length else None
+    try:
+        r = _http().request(request.method, request.full_path if request.query_string else request.path,
+                            headers=_headers(), content=body)
+    except httpx.HTTPError as e:
+        return jsonify({"error": f"background services unavailable: {e}"}), 503
+    headers = [(h, r.headers[h]) for h in RETURN_HEADERS if h in r.headers]
+    return Response(r.content, status=r.status_code, headers=headers)
+
+
+def services_route(f):
+    """Run the view in the process that owns capture/scanner state."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if is_api_worker():
+            return forward()
+        return f(*args, **kwargs)
+    return decorated
+
+
+def services_json(path: str, local):
+    """local() in the services process, else the launcher's JSON for path (None if unreachable)."""
+    if not is_api_worker():
+        return local()
+    try:
+        r = _http().get(path, headers=_headers())
+        return r.json() if r.status_code == 200 else None
+    except Exception:
+        return None
+
+
+def serve_control(app, port: int = 0):
+    """Serve app on localhost in a background thread for the API workers to call into."""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
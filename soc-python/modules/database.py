@@ -1,7 +1,35 @@
 import sqlite3
 import os
+import json
+import base64
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from modules.config import DB_PATH, DATA_DIR
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POOL_SIZE = 16
+POOL_TIMEOUT = 30
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-16384",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_pool_idle = []
+_pool_cond = threading.Condition()
+_pool_local = threading.local()
+_pool_stats = {"open": 0, "in_use": 0, "checkouts": 0, "waits": 0,
+               "wait_ms_total": 0.0, "max_wait_ms": 0.0}
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -77,19 +105,483 @@ CREATE TABLE IF NOT EXISTS packets (
 """
 
 
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+    message, host_name, program,
+    content='logs', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+    INSERT INTO logs_fts (rowid, message, host_name, program)
+    VALUES (new.id, new.message, new.host_name, new.program);
+END;
+
+CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, message, host_name, program)
+    VALUES ('delete', old.id, old.message, old.host_name, old.program);
+END;
+
+CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF message, host_name, program ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, message, host_name, program)
+    VALUES ('delete', old.id, old.message, old.host_name, old.program);
+    INSERT INTO logs_fts (rowid, message, host_name, program)
+    VALUES (new.id, new.message, new.host_name, new.program);
+END;
+"""
+
+
+MIGRATIONS = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_logs_created ON logs (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_logs_severity ON logs (severity, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_logs_type ON logs (log_type, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_logs_source ON logs (log_source);
+    CREATE INDEX IF NOT EXISTS idx_logs_src_ip ON logs (src_ip, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_logs_dst_ip ON logs (dst_ip, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts (status, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts (severity, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_alerts_status_severity ON alerts (status, severity, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_alerts_category ON alerts (category);
+    CREATE INDEX IF NOT EXISTS idx_alerts_src_ip ON alerts (src_ip);
+    CREATE INDEX IF NOT EXISTS idx_alerts_dst_ip ON alerts (dst_ip);
+    CREATE INDEX IF NOT EXISTS idx_packets_created ON packets (created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_packets_src_ip ON packets (src_ip);
+    CREATE INDEX IF NOT EXISTS idx_packets_dst_ip ON packets (dst_ip);
+    CREATE INDEX IF NOT EXISTS idx_assets_last_seen ON assets (last_seen, id);
+    CREATE INDEX IF NOT EXISTS idx_assets_status ON assets (status);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stat_counters (
+        scope TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, dimension, key)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS logs_counters_insert AFTER INSERT ON logs BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'total', '', 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'day', date(new.created_at), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'severity', IFNULL(new.severity, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'log_type', IFNULL(new.log_type, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'log_source', IFNULL(new.log_source, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS logs_counters_delete AFTER DELETE ON logs BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'total', '', -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'day', date(old.created_at), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'severity', IFNULL(old.severity, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'log_type', IFNULL(old.log_type, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('logs', 'log_source', IFNULL(old.log_source, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'logs', 'total', '', COUNT(*) FROM logs GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'logs', 'day', date(logs.created_at), COUNT(*) FROM logs GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'logs', 'severity', IFNULL(logs.severity, ''), COUNT(*) FROM logs GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'logs', 'log_type', IFNULL(logs.log_type, ''), COUNT(*) FROM logs GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'logs', 'log_source', IFNULL(logs.log_source, ''), COUNT(*) FROM logs GROUP BY 3;
+
+    CREATE TRIGGER IF NOT EXISTS alerts_counters_insert AFTER INSERT ON alerts BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'total', '', 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'status', IFNULL(new.status, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'severity', IFNULL(new.severity, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'category', IFNULL(new.category, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS alerts_counters_delete AFTER DELETE ON alerts BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'total', '', -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'status', IFNULL(old.status, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'severity', IFNULL(old.severity, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'category', IFNULL(old.category, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS alerts_counters_update AFTER UPDATE OF status, severity, category ON alerts BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'status', IFNULL(old.status, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'severity', IFNULL(old.severity, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'category', IFNULL(old.category, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'status', IFNULL(new.status, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'severity', IFNULL(new.severity, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('alerts', 'category', IFNULL(new.category, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'alerts', 'total', '', COUNT(*) FROM alerts GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'alerts', 'status', IFNULL(alerts.status, ''), COUNT(*) FROM alerts GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'alerts', 'severity', IFNULL(alerts.severity, ''), COUNT(*) FROM alerts GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'alerts', 'category', IFNULL(alerts.category, ''), COUNT(*) FROM alerts GROUP BY 3;
+
+    CREATE TRIGGER IF NOT EXISTS assets_counters_insert AFTER INSERT ON assets BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'total', '', 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'status', IFNULL(new.status, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS assets_counters_delete AFTER DELETE ON assets BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'total', '', -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'status', IFNULL(old.status, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS assets_counters_update AFTER UPDATE OF status ON assets BEGIN
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'status', IFNULL(old.status, ''), -1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+        INSERT INTO stat_counters (scope, dimension, key, count) VALUES ('assets', 'status', IFNULL(new.status, ''), 1)
+            ON CONFLICT (scope, dimension, key) DO UPDATE SET count = count + excluded.count;
+    END;
+
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'assets', 'total', '', COUNT(*) FROM assets GROUP BY 3;
+    INSERT OR REPLACE INTO stat_counters (scope, dimension, key, count)
+        SELECT 'assets', 'status', IFNULL(assets.status, ''), COUNT(*) FROM assets GROUP BY 3;
+    """,
+    """
+    ALTER TABLE alerts ADD COLUMN count INTEGER DEFAULT 1;
+    ALTER TABLE alerts ADD COLUMN first_seen TEXT;
+    ALTER TABLE alerts ADD COLUMN last_seen TEXT;
+    UPDATE alerts SET count = 1, first_seen = timestamp, last_seen = timestamp;
+    CREATE INDEX IF NOT EXISTS idx_alerts_dedup ON alerts (rule_id, src_ip, dst_ip, dst_port, first_seen);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS flows (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        src_ip TEXT,
+        dst_ip TEXT,
+        src_port INTEGER,
+        dst_port INTEGER,
+        protocol TEXT,
+        packets INTEGER,
+        bytes INTEGER,
+        flags TEXT,
+        alerts INTEGER DEFAULT 0,
+        first_seen TEXT,
+        last_seen TEXT,
+        end_reason TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_flows_last_seen ON flows (last_seen, id);
+    CREATE INDEX IF NOT EXISTS idx_flows_src_ip ON flows (src_ip, last_seen, id);
+    CREATE INDEX IF NOT EXISTS idx_flows_dst_ip ON flows (dst_ip, last_seen, id);
+    """,
+    """
+    ALTER TABLE assets ADD COLUMN last_scanned TEXT;
+    ALTER TABLE assets ADD COLUMN change_count INTEGER DEFAULT 0;
+    UPDATE assets SET last_scanned = last_seen, change_count = 0;
+    CREATE INDEX IF NOT EXISTS idx_assets_last_scanned ON assets (last_scanned);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS asset_ports (
+        asset_id INTEGER NOT NULL,
+        port INTEGER NOT NULL,
+        protocol TEXT NOT NULL DEFAULT 'tcp',
+        service TEXT,
+        version TEXT,
+        first_seen TEXT,
+        last_seen TEXT,
+        PRIMARY KEY (asset_id, port, protocol)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_asset_ports_port ON asset_ports (port, asset_id);
+    CREATE INDEX IF NOT EXISTS idx_asset_ports_service ON asset_ports (service, asset_id);
+    CREATE INDEX IF NOT EXISTS idx_assets_os ON assets (os_info COLLATE NOCASE);
+
+    CREATE TRIGGER IF NOT EXISTS assets_ports_delete AFTER DELETE ON assets BEGIN
+        DELETE FROM asset_ports WHERE asset_id = old.id;
+    END;
+
+    INSERT OR IGNORE INTO asset_ports (asset_id, port, protocol, service, version, first_seen, last_seen)
+        SELECT a.id, json_extract(j.value, '$.port'), IFNULL(json_extract(j.value, '$.protocol'), 'tcp'),
+               json_extract(j.value, '$.service'), json_extract(j.value, '$.version'), a.first_seen, a.last_seen
+        FROM assets a, json_each(CASE WHEN json_valid(a.open_ports) THEN a.open_ports ELSE '[]' END) j
+        WHERE json_extract(j.value, '$.port') IS NOT NULL;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS login_throttle (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    ) WITHOUT ROWID;
+    """,
+]
+
+HOT_QUERIES = {
+    "logs.page": ("SELECT * FROM logs WHERE 1=1 AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?", ("", 0, 50)),
+    "logs.severity": ("SELECT * FROM logs WHERE 1=1 AND severity=? ORDER BY created_at DESC, id DESC LIMIT ?", ("high", 50)),
+    "logs.log_type": ("SELECT * FROM logs WHERE 1=1 AND log_type=? ORDER BY created_at DESC, id DESC LIMIT ?", ("system", 50)),
+    "logs.src_ip": ("SELECT * FROM logs WHERE 1=1 AND src_ip=? ORDER BY created_at DESC, id DESC LIMIT ?", ("10.0.0.1", 50)),
+    "logs.dst_ip": ("SELECT * FROM logs WHERE 1=1 AND dst_ip=? ORDER BY created_at DESC, id DESC LIMIT ?", ("10.0.0.1", 50)),
+    "logs.today": ("SELECT COUNT(*) FROM logs WHERE created_at >= date('now')", ()),
+    "logs.by_severity": ("SELECT severity, COUNT(*) FROM logs GROUP BY severity", ()),
+    "logs.by_type": ("SELECT log_type, COUNT(*) FROM logs GROUP BY log_type", ()),
+    "logs.by_source": ("SELECT log_source, COUNT(*) FROM logs GROUP BY log_source LIMIT 10", ()),
+    "alerts.page": ("SELECT * FROM alerts WHERE 1=1 AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?", ("", 0, 50)),
+    "alerts.status": ("SELECT * FROM alerts WHERE 1=1 AND status=? ORDER BY created_at DESC, id DESC LIMIT ?", ("open", 50)),
+    "alerts.severity": ("SELECT * FROM alerts WHERE 1=1 AND severity=? ORDER BY created_at DESC, id DESC LIMIT ?", ("high", 50)),
+    "alerts.status_severity": ("SELECT * FROM alerts WHERE 1=1 AND status=? AND severity=? ORDER BY created_at DESC, id DESC LIMIT ?", ("open", "high", 50)),
+    "alerts.open": ("SELECT COUNT(*) FROM alerts WHERE status='open'", ()),
+    "alerts.by_severity": ("SELECT severity, COUNT(*) FROM alerts GROUP BY severity", ()),
+    "alerts.by_category": ("SELECT category, COUNT(*) FROM alerts GROUP BY category", ()),
+    "alerts.src_ip": ("SELECT * FROM alerts WHERE src_ip=?", ("10.0.0.1",)),
+    "packets.page": ("SELECT * FROM packets WHERE 1=1 ORDER BY created_at DESC, id DESC LIMIT ?", (100,)),
+    "packets.src_ip": ("SELECT * FROM packets WHERE src_ip=?", ("10.0.0.1",)),
+    "flows.page": ("SELECT * FROM flows WHERE 1=1 ORDER BY last_seen DESC, id DESC LIMIT ?", (100,)),
+    "flows.src_ip": ("SELECT * FROM flows WHERE 1=1 AND src_ip=? ORDER BY last_seen DESC, id DESC LIMIT ?", ("10.0.0.1", 100)),
+    "assets.page": ("SELECT * FROM assets WHERE 1=1 ORDER BY last_seen DESC, id DESC LIMIT ?", (50,)),
+    "assets.status": ("SELECT COUNT(*) FROM assets WHERE status='up'", ()),
+    "assets.port": ("SELECT asset_id FROM asset_ports WHERE port=?", (3389,)),
+    "assets.service": ("SELECT asset_id FROM asset_ports WHERE service=?", ("ssh",)),
+    "assets.os": ("SELECT id FROM assets WHERE os_info LIKE ? ESCAPE '\\'", ("linux%",)),
+}
+
+
+def _fts5_available() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+FTS_AVAILABLE = _fts5_available()
+
+
 def get_conn():
     os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=POOL_TIMEOUT, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+def _acquire() -> sqlite3.Connection:
+    started = time.perf_counter()
+    waited = False
+    with _pool_cond:
+        while not _pool_idle and _pool_stats["open"] >= POOL_SIZE:
+            waited = True
+            if not _pool_cond.wait(timeout=POOL_TIMEOUT):
+                raise TimeoutError("database connection pool exhausted")
+        conn = _pool_idle.pop() if _pool_idle else None
+        if conn is None:
+            _pool_stats["open"] += 1
+        _pool_stats["in_use"] += 1
+        _pool_stats["checkouts"] += 1
+        if waited:
+            wait_ms = (time.perf_counter() - started) * 1000
+            _pool_stats["waits"] += 1
+            _pool_stats["wait_ms_total"] += wait_ms
+            _pool_stats["max_wait_ms"] = max(_pool_stats["max_wait_ms"], wait_ms)
+    if conn is None:
+        try:
+            conn = get_conn()
+        except Exception:
+            _release(None)
+            raise
+    return conn
+
+
+def _release(conn: sqlite3.Connection | None):
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+    with _pool_cond:
+        _pool_stats["in_use"] -= 1
+        if conn is None:
+            _pool_stats["open"] -= 1
+        else:
+            _pool_idle.append(conn)
+        _pool_cond.notify()
+
+
+@contextmanager
+def connection():
+    held = getattr(_pool_local, "conn", None)
+    if held is not None:
+        yield held
+        return
+    conn = _acquire()
+    _pool_local.conn = conn
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _pool_local.conn = None
+        _release(conn)
+
+
+def pool_stats() -> dict:
+    with _pool_cond:
+        stats = dict(_pool_stats, idle=len(_pool_idle), size=POOL_SIZE)
+    stats["avg_wait_ms"] = round(stats["wait_ms_total"] / stats["waits"], 2) if stats["waits"] else 0.0
+    stats["wait_ms_total"] = round(stats["wait_ms_total"], 2)
+    stats["max_wait_ms"] = round(stats["max_wait_ms"], 2)
+    return stats
+
+
+def encode_cursor(direction: str, *values) -> str:
+    raw = json.dumps([direction, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, list] | None:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if isinstance(data, list) and data and data[0] in ("n", "p"):
+            return data[0], data[1:]
+    except Exception:
+        pass
+    return None
+
+
+def keyset_page(conn, sql: str, params: list, keys: tuple[str, ...], limit: int,
+                cursor: str = None, descending: bool = True, offset: int = 0) -> dict:
+    direction, values = (decode_cursor(cursor) if cursor else None) or ("n", None)
+    if values is not None and len(values) != len(keys):
+        direction, values = "n", None
+    backwards = direction == "p"
+    desc = descending != backwards
+    if values is not None:
+        sql += f" AND ({', '.join(keys)}) {'<' if desc else '>'} ({', '.join('?' * len(keys))})"
+        params = params + list(values)
+        offset = 0
+    order = ", ".join(f"{k} {'DESC' if desc else 'ASC'}" for k in keys)
+    rows = conn.execute(f"{sql} ORDER BY {order} LIMIT ? OFFSET ?", params + [limit + 1, offset]).fetchall()
+    more = len(rows) > limit
+    rows = [dict(r) for r in rows[:limit]]
+    if backwards:
+        rows.reverse()
+    columns = [k.rsplit(".", 1)[-1] for k in keys]
+    has_next = more if not backwards else values is not None
+    has_prev = (values is not None or offset > 0) if not backwards else more
+    return {
+        "rows": rows,
+        "next": encode_cursor("n", *(rows[-1][c] for c in columns)) if rows and has_next else None,
+        "prev": encode_cursor("p", *(rows[0][c] for c in columns)) if rows and has_prev else None,
+    }
+
+
+def to_db_time(value: str | None) -> str | None:
+    """Normalise an ISO date/datetime to the CURRENT_TIMESTAMP format used by created_at."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def count_rows(conn, table: str, where: str, params: list, mode: str) -> int | None:
+    if mode == "exact":
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+    if mode == "approx" and not params:
+        return conn.execute(
+            f"SELECT COALESCE(MAX(rowid) - MIN(rowid) + 1, 0) FROM {table.split()[0]}"
+        ).fetchone()[0]
+    return None
+
+
+def migrate(conn) -> int:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f"BEGIN; {script}; PRAGMA user_version={number}; COMMIT;")
+    return len(MIGRATIONS)
+
+
+def check_query_plans(conn=None) -> dict[str, list[str]]:
+    if conn is None:
+        with connection() as conn:
+            return check_query_plans(conn)
+    problems = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        details = [r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        bad = [d for d in details
+               if (d.startswith("SCAN ") and " INDEX " not in d) or "TEMP B-TREE" in d]
+        if bad:
+            problems[name] = bad
+    return problems
+
+
+def read_counters(conn, scope: str) -> dict[str, dict]:
+    counters = {}
+    for r in conn.execute("SELECT dimension, key, count FROM stat_counters WHERE scope=? AND count > 0", (scope,)):
+        counters.setdefault(r["dimension"], {})[r["key"] or None] = r["count"]
+    return counters
+
+
+@contextmanager
+def _init_lock():
+    """Serialise schema setup across processes (gunicorn workers, CLI tools)."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(DATA_DIR, ".init.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
 def init_db():
-    conn = get_conn()
-    conn.executescript(SCHEMA)
-    _seed_admin(conn)
-    conn.commit()
-    conn.close()
+    with _init_lock(), connection() as conn:
+        conn.executescript(SCHEMA)
+        migrate(conn)
+        if FTS_AVAILABLE:
+            existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name='logs_fts'").fetchone()
+            conn.executescript(FTS_SCHEMA)
+            if not existed:
+                rebuild_fts(conn)
+        _seed_admin(conn)
+
+
+def rebuild_fts(conn=None):
+    if not FTS_AVAILABLE:
+        return
+    if conn is None:
+        with connection() as conn:
+            return rebuild_fts(conn)
+    conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
 
 
 def _seed_admin(conn):
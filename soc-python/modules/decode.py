@@ -0,0 +1,119 @@
+import socket
+import struct
+from datetime import datetime, timezone
+
+DLT_EN10MB = 1
+DLT_RAW = 101
+DLT_LINUX_SLL = 113
+DLT_IPV4 = 228
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = (0x8100, 0x88A8)
+
+PROTOCOLS = {6: "TCP", 17: "UDP", 1: "ICMP"}
+TCP_FLAGS = "FSRPAUECN"
+FLAG_STRINGS = ["".join(f for i, f in enumerate(TCP_FLAGS) if v & (1 << i)) for v in range(512)]
+PREVIEW_BYTES = 64
+
+_ports = struct.Struct("!HH")
+_ntoa = socket.inet_ntoa
+
+
+def _ip_offset(buf: memoryview, linktype: int) -> int | None:
+    if linktype == DLT_EN10MB:
+        offset = 12
+        ethertype = (buf[offset] << 8) | buf[offset + 1]
+        while ethertype in ETH_P_8021Q:
+            offset += 4
+            ethertype = (buf[offset] << 8) | buf[offset + 1]
+        return offset + 2 if ethertype == ETH_P_IP else None
+    if linktype == DLT_LINUX_SLL:
+        return 16 if (buf[14] << 8) | buf[15] == ETH_P_IP else None
+    if linktype in (DLT_RAW, DLT_IPV4):
+        return 0
+    return None
+
+
+def flow_tuple(data: bytes, linktype: int = DLT_EN10MB) -> tuple | None:
+    """(src, dst, proto, sport, dport) as raw values, without building pkt_info."""
+    buf = memoryview(data)
+    try:
+        ip = _ip_offset(buf, linktype)
+        if ip is None or buf[ip] >> 4 != 4:
+            return None
+        proto = buf[ip + 9]
+        src, dst = bytes(buf[ip + 12:ip + 16]), bytes(buf[ip + 16:ip + 20])
+        if proto in (6, 17) and not ((buf[ip + 6] & 0x1F) << 8) | buf[ip + 7]:
+            sport, dport = _ports.unpack_from(buf, ip + (buf[ip] & 0x0F) * 4)
+            return src, dst, proto, sport, dport
+        return src, dst, proto, 0, 0
+    except (IndexError, struct.error):
+        return None
+
+
+def decode_frame(data: bytes, linktype: int = DLT_EN10MB, ts: float = None, length: int = None) -> dict | None:
+    buf = memoryview(data)
+    try:
+        ip = _ip_offset(buf, linktype)
+        if ip is None or buf[ip] >> 4 != 4:
+            return None
+        ihl = (buf[ip] & 0x0F) * 4
+        total_len = (buf[ip + 2] << 8) | buf[ip + 3]
+        end = min(len(buf), ip + total_len) if total_len else len(buf)
+        fragment = ((buf[ip + 6] & 0x1F) << 8) | buf[ip + 7]
+        proto = PROTOCOLS.get(buf[ip + 9], "OTHER") if not fragment else "OTHER"
+        src_ip = _ntoa(buf[ip + 12:ip + 16])
+        dst_ip = _ntoa(buf[ip + 16:ip + 20])
+    except (IndexError, struct.error, OSError):
+        return None
+    l4 = ip + ihl
+    src_port = dst_port = flags = None
+    payload = None
+    try:
+        if proto == "TCP":
+            src_port, dst_port = _ports.unpack_from(buf, l4)
+            flags = FLAG_STRINGS[((buf[l4 + 12] & 0x01) << 8) | buf[l4 + 13]]
+            payload = l4 + (buf[l4 + 12] >> 4) * 4
+        elif proto == "UDP":
+            src_port, dst_port = _ports.unpack_from(buf, l4)
+            payload = l4 + 8
+        elif proto == "ICMP":
+            payload = l4 + 8
+    except (IndexError, struct.error):
+        proto, src_port, dst_port, flags, payload = "OTHER", None, None, None, None
+    preview = bytes(buf[payload:min(end, payload + PREVIEW_BYTES)]).hex() if payload is not None and payload < end else ""
+    when = datetime.fromtimestamp(ts, timezone.utc) if ts is not None else datetime.now(timezone.utc)
+    return {
+        "timestamp": when.isoformat(),
+        "src_ip": src_ip, "dst_ip": dst_ip,
+        "src_port": src_port, "dst_port": dst_port,
+        "protocol": proto, "length": length or len(data),
+        "flags": flags, "payload_preview": preview,
+    }
+
+
+def build_bpf_filter(rules: list[dict]) -> str | None:
+    clauses = []
+    for rule in rules:
+        parts = []
+        proto = (rule.get("proto") or "").lower()
+        mask = 0
+        for ch in rule.get("flags") or "":
+            if ch in TCP_FLAGS[:8]:
+                mask |= 1 << TCP_FLAGS.index(ch)
+        if mask and not proto:
+            proto = "tcp"
+        if proto:
+            parts.append(proto)
+        if rule.get("dst_port"):
+            parts.append(f"dst port {int(rule['dst_port'])}")
+        if mask:
+            parts.append(f"tcp[tcpflags] & {mask} == {mask}")
+        if not parts:
+            return None
+        clause = " and ".join(parts)
+        if clause not in clauses:
+            clauses.append(clause)
+    if not clauses:
+        return None
+    return "ip and (" + " or ".join(f"({c})" for c in clauses) + ")"
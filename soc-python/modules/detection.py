@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict, deque
+
+MAX_TRACKED_KEYS = 50000
+WINDOW_BUCKETS = 10
+
+METRICS = ("count", "distinct_dst_ports")
+TRACK_KEYS = {
+    "src":     lambda p: (p.get("src_ip"),),
+    "dst":     lambda p: (p.get("dst_ip"),),
+    "src_dst": lambda p: (p.get("src_ip"), p.get("dst_ip")),
+}
+
+
+class ThresholdTracker:
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self.states = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def observe(self, rule: dict, pkt_info: dict, now: float) -> bool:
+        spec = rule["threshold"]
+        window = float(spec["window"])
+        key = (rule["id"], *TRACK_KEYS[spec.get("track", "src")](pkt_info))
+        with self._lock:
+            state = self.states.get(key)
+            if state is None:
+                state = {"fired_until": 0.0, "buckets": deque(), "ports": OrderedDict()}
+                self.states[key] = state
+                if len(self.states) > self.max_keys:
+                    self.states.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.states.move_to_end(key)
+            if now < state["fired_until"]:
+                return False
+            if spec.get("metric", "count") == "distinct_dst_ports":
+                total = self._observe_port(state, pkt_info.get("dst_port"), now, window)
+            else:
+                total = self._observe_count(state, now, window)
+            if total < spec["count"]:
+                return False
+            state["fired_until"] = now + window
+            state["buckets"].clear()
+            state["ports"].clear()
+            return True
+
+    @staticmethod
+    def _observe_count(state: dict, now: float, window: float) -> int:
+        buckets = state["buckets"]
+        width = window / WINDOW_BUCKETS
+        start = now - now % width
+        while buckets and buckets[0][0] <= now - window:
+            buckets.popleft()
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([start, 1])
+        return sum(b[1] for b in buckets)
+
+    @staticmethod
+    def _observe_port(state: dict, port, now: float, window: float) -> int:
+        ports = state["ports"]
+        if port is None:
+            return len(ports)
+        ports[port] = now
+        ports.move_to_end(port)
+        while ports:
+            _, seen = next(iter(ports.items()))
+            if seen > now - window:
+                break
+            ports.popitem(last=False)
+        return len(ports)
+
+    def stats(self) -> dict:
+        return {"tracked_keys": len(self.states), "max_keys": self.max_keys, "evictions": self.evictions}
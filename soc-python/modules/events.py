@@ -0,0 +1,162 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from modules import control
+
+SUBSCRIBER_QUEUE = 1000
+REPLAY_EVENTS = 1000
+KEEPALIVE = 15
+RELAY_RETRY = 3
+# Streams served through the WSGI app each pin a request thread, so only a few may be
+# open at once (SOC_STREAM_SLOTS, set by soc_platform from --threads) and each is
+# recycled after WSGI_STREAM_SECONDS; the EventSource reconnects with Last-Event-ID.
+WSGI_STREAM_SLOTS = 2
+WSGI_STREAM_SECONDS = 300
+
+# (id, type, data)
+_recent = deque(maxlen=REPLAY_EVENTS)
+_subscribers = set()
+_lock = threading.Lock()
+_seq = itertools.count(1)
+_stats = {"published": 0, "delivered": 0, "overflows": 0}
+_relay_thread = None
+_wsgi_slots = None
+_wsgi_open = 0
+
+
+class Subscription:
+    def __init__(self):
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE)
+        self.overflow = False
+
+    def get(self, timeout: float = KEEPALIVE) -> list[tuple]:
+        """Block for the next events; a full queue turns into a single resync event."""
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if self.overflow:
+            self.overflow = False
+            return [(events[-1][0], "resync", {})]
+        return events
+
+
+def has_subscribers() -> bool:
+    return bool(_subscribers)
+
+
+def publish(kind: str, data: dict, event_id: int = None):
+    with _lock:
+        event = (event_id if event_id is not None else next(_seq), kind, data)
+        _recent.append(event)
+        _stats["published"] += 1
+        subscribers = list(_subscribers)
+    for sub in subscribers:
+        try:
+            sub.queue.put_nowait(event)
+            _stats["delivered"] += 1
+        except queue.Full:
+            sub.overflow = True
+            _stats["overflows"] += 1
+
+
+def subscribe(last_id: int = None) -> Subscription:
+    """Register a listener; events after last_id still in the replay window are queued first."""
+    if control.is_api_worker():
+        _ensure_relay()
+    sub = Subscription()
+    with _lock:
+        for event in backlog(last_id)[-SUBSCRIBER_QUEUE:]:
+            sub.queue.put_nowait(event)
+        _subscribers.add(sub)
+    return sub
+
+
+def backlog(last_id: int = None) -> list[tuple]:
+    """Buffered events after last_id, or a lone resync when some were already discarded."""
+    if last_id is None:
+        return []
+    recent = list(_recent)
+    if recent and recent[0][0] > last_id + 1:
+        return [(recent[-1][0], "resync", {})]
+    return [e for e in recent if e[0] > last_id]
+
+
+def _wsgi_slot_count() -> int:
+    return max(1, int(os.environ.get("SOC_STREAM_SLOTS", WSGI_STREAM_SLOTS)))
+
+
+def acquire_wsgi_slot() -> bool:
+    global _wsgi_slots, _wsgi_open
+    with _lock:
+        if _wsgi_slots is None:
+            _wsgi_slots = threading.BoundedSemaphore(_wsgi_slot_count())
+        if not _wsgi_slots.acquire(blocking=False):
+            return False
+        _wsgi_open += 1
+        return True
+
+
+def release_wsgi_slot():
+    global _wsgi_open
+    with _lock:
+        _wsgi_open -= 1
+        _wsgi_slots.release()
+
+
+def unsubscribe(sub: Subscription):
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def format_sse(event: tuple) -> str:
+    event_id, kind, data = event
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _relay():
+    """API worker: mirror the launcher's stream into this process's bus over one connection."""
+    from modules.auth import generate_token
+    last_id = None
+    while True:
+        try:
+            headers = {"Authorization": "Bearer " + generate_token(0, "events-relay", "service")}
+            if last_id is not None:
+                headers["Last-Event-ID"] = str(last_id)
+            with control._http().stream("GET", "/api/stream", headers=headers, timeout=KEEPALIVE * 4) as r:
+                fields = {}
+                for line in r.iter_lines():
+                    if line:
+                        name, _, value = line.partition(":")
+                        fields[name] = value.lstrip()
+                        continue
+                    if "event" in fields and "id" in fields:
+                        last_id = int(fields["id"])
+                        publish(fields["event"], json.loads(fields.get("data") or "{}"), last_id)
+                    fields = {}
+        except Exception:
+            pass
+        time.sleep(RELAY_RETRY)
+
+
+def _ensure_relay():
+    global _relay_thread
+    with _lock:
+        if _relay_thread is None or not _relay_thread.is_alive():
+            _relay_thread = threading.Thread(target=_relay, daemon=True)
+            _relay_thread.start()
+
+
+def stats() -> dict:
+    return {"subscribers": len(_subscribers), "buffered": len(_recent), "wsgi_streams": _wsgi_open,
+            "wsgi_slots": _wsgi_slot_count(),
+            "relay": bool(_relay_thread and _relay_thread.is_alive()), **_stats}
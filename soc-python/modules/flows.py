@@ -0,0 +1,97 @@
+import threading
+import time
+from datetime import datetime, timezone
+from modules.decode import FLAG_STRINGS, TCP_FLAGS
+
+IDLE_TIMEOUT = 15
+ACTIVE_TIMEOUT = 1800
+MAX_FLOWS = 100000
+
+FIN_RST = 0x01 | 0x04
+
+FLOW_INSERT = """
+    INSERT INTO flows (src_ip, dst_ip, src_port, dst_port, protocol, packets, bytes,
+                       flags, alerts, first_seen, last_seen, end_reason)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+def _mask(flags: str | None) -> int:
+    mask = 0
+    for ch in flags or "":
+        i = TCP_FLAGS.find(ch)
+        if i >= 0:
+            mask |= 1 << i
+    return mask
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class FlowTable:
+    """Unidirectional 5-tuple flows with NetFlow-style idle/active expiry."""
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT, active_timeout: float = ACTIVE_TIMEOUT,
+                 max_flows: int = MAX_FLOWS):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.flows = {}
+        self.expired = []
+        self.stats = {"created": 0, "exported": 0, "evicted": 0}
+        self._clock = (0.0, time.monotonic())
+        self._lock = threading.Lock()
+
+    def observe(self, pkt_info: dict, alerts: int, now: float):
+        key = (pkt_info.get("src_ip"), pkt_info.get("dst_ip"), pkt_info.get("src_port"),
+               pkt_info.get("dst_port"), pkt_info.get("protocol"))
+        mask = _mask(pkt_info.get("flags"))
+        length = pkt_info.get("length") or 0
+        with self._lock:
+            if now > self._clock[0]:
+                self._clock = (now, time.monotonic())
+            flow = self.flows.get(key)
+            if flow is None:
+                # [first, last, packets, bytes, flag mask, alerts]
+                self.flows[key] = [now, now, 1, length, mask, alerts]
+                self.stats["created"] += 1
+                if len(self.flows) > self.max_flows:
+                    old = next(iter(self.flows))
+                    self.expired.append((old, self.flows.pop(old), "evicted"))
+                    self.stats["evicted"] += 1
+                return
+            flow[1] = now
+            flow[2] += 1
+            flow[3] += length
+            flow[4] |= mask
+            flow[5] += alerts
+
+    def now(self) -> float:
+        ts, mono = self._clock
+        return ts + (time.monotonic() - mono)
+
+    def expire(self, force: bool = False) -> list[tuple]:
+        """Remove finished flows and return them as FLOW_INSERT rows."""
+        with self._lock:
+            now = self.now()
+            done, self.expired = self.expired, []
+            for key, flow in list(self.flows.items()):
+                if force:
+                    reason = "flush"
+                elif now - flow[1] >= self.idle_timeout:
+                    reason = "idle"
+                elif now - flow[0] >= self.active_timeout:
+                    reason = "active"
+                elif flow[4] & FIN_RST and now - flow[1] >= 1:
+                    reason = "end"
+                else:
+                    continue
+                done.append((key, self.flows.pop(key), reason))
+            self.stats["exported"] += len(done)
+        return [(*key, flow[2], flow[3], FLAG_STRINGS[flow[4]] or None, flow[5],
+                 _iso(flow[0]), _iso(flow[1]), reason) for key, flow, reason in done]
+
+    def status(self) -> dict:
+        return {"active": len(self.flows), "idle_timeout": self.idle_timeout,
+                "active_timeout": self.active_timeout, **self.stats}
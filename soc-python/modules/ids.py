@@ -1,16 +1,56 @@
 import threading
 import json
+import queue
+import select
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
-from modules.database import get_conn
+from modules.database import connection, keyset_page, count_rows, read_counters
 from modules.config import load_config
+from modules.detection import ThresholdTracker
+from modules.pipeline import ShardedPipeline
+from modules.flows import FlowTable, FLOW_INSERT
+from modules.storage import write_packets, page_packets
+from modules import events, cache
+from modules.decode import decode_frame, build_bpf_filter, DLT_EN10MB, DLT_LINUX_SLL, DLT_RAW, PREVIEW_BYTES
 
 _capture_thread = None
 _capture_running = False
 _captured_count = 0
+_capture_info = {}
+_pipeline = None
+
+_packet_queue = None
+_writer_thread = None
+_writer_lock = threading.Lock()
+_writer_stats = {"dropped": 0, "failed": 0, "written": 0, "flushes": 0,
+                 "last_flush_ms": 0.0, "max_flush_ms": 0.0, "last_batch": 0,
+                 "flush_errors": 0, "flows_pending": 0, "flows_dropped": 0, "last_error": None}
+
+MAX_AGGREGATED_ALERTS = 10000
+MAX_PENDING_FLOWS = 100000
+STREAM_ROWS = 20
+STREAM_FIELDS = ("timestamp", "protocol", "src_ip", "src_port", "dst_ip", "dst_port",
+                 "length", "flags", "alert_triggered")
+
+_thresholds = ThresholdTracker()
+
+_alert_window = None
+_flows = FlowTable()
+_flow_tracking = True
+_flow_flush_at = 0.0
+_flow_retry = []
+_store_policy = None
+_store_seq = 0
+_alert_agg = OrderedDict()
+_agg_evicted = []
+_agg_lock = threading.Lock()
 
 IDS_RULES = [
-    {"id": "R001", "name": "Port Scan Detected",       "proto": None,  "dst_port": None,  "flags": "S",   "severity": "high",     "category": "reconnaissance"},
-    {"id": "R002", "name": "SSH Brute Force",           "proto": "TCP", "dst_port": 22,    "flags": None,  "severity": "high",     "category": "brute-force"},
+    {"id": "R001", "name": "Port Scan Detected",       "proto": None,  "dst_port": None,  "flags": "S",   "severity": "high",     "category": "reconnaissance",
+     "threshold": {"track": "src", "metric": "distinct_dst_ports", "count": 20, "window": 10}},
+    {"id": "R002", "name": "SSH Brute Force",           "proto": "TCP", "dst_port": 22,    "flags": "S",   "severity": "high",     "category": "brute-force",
+     "threshold": {"track": "src_dst", "metric": "count", "count": 10, "window": 60}},
     {"id": "R003", "name": "Telnet Access",             "proto": "TCP", "dst_port": 23,    "flags": None,  "severity": "medium",   "category": "suspicious"},
     {"id": "R004", "name": "HTTP Traffic",              "proto": "TCP", "dst_port": 80,    "flags": None,  "severity": "info",     "category": "network"},
     {"id": "R005", "name": "HTTPS Traffic",             "proto": "TCP", "dst_port": 443,   "flags": None,  "severity": "info",     "category": "network"},
@@ -18,58 +58,299 @@ IDS_RULES = [
     {"id": "R007", "name": "FTP Access",                "proto": "TCP", "dst_port": 21,    "flags": None,  "severity": "medium",   "category": "suspicious"},
     {"id": "R008", "name": "SMB Traffic",               "proto": "TCP", "dst_port": 445,   "flags": None,  "severity": "medium",   "category": "lateral-movement"},
     {"id": "R009", "name": "RDP Access",                "proto": "TCP", "dst_port": 3389,  "flags": None,  "severity": "medium",   "category": "remote-access"},
-    {"id": "R010", "name": "ICMP Flood Detected",       "proto": "ICMP","dst_port": None,  "flags": None,  "severity": "medium",   "category": "dos"},
+    {"id": "R010", "name": "ICMP Flood Detected",       "proto": "ICMP","dst_port": None,  "flags": None,  "severity": "medium",   "category": "dos",
+     "threshold": {"track": "src", "metric": "count", "count": 500, "window": 5}},
 ]
 
 
+LINKTYPES = {"Ether": DLT_EN10MB, "CookedLinux": DLT_LINUX_SLL, "IP": DLT_RAW}
+
+TCP_FLAG_BITS = {"F": 0x01, "S": 0x02, "R": 0x04, "P": 0x08,
+                 "A": 0x10, "U": 0x20, "E": 0x40, "C": 0x80, "N": 0x100}
+
+
+def _flags_mask(flags: str | None) -> int:
+    mask = 0
+    for ch in flags or "":
+        mask |= TCP_FLAG_BITS.get(ch, 0)
+    return mask
+
+
+def compile_rules(rules: list[dict]) -> dict:
+    index = {}
+    for pos, rule in enumerate(rules):
+        key = (rule["proto"] or None, rule["dst_port"] or None)
+        index.setdefault(key, []).append((pos, _flags_mask(rule["flags"]), rule))
+    return index
+
+
+def load_rules(rules: list[dict]):
+    global IDS_RULES, _rule_index, _candidate_cache
+    _rule_index = compile_rules(rules)
+    _candidate_cache = {}
+    IDS_RULES = rules
+
+
+def _candidates(proto: str | None, port: int | None) -> list[tuple]:
+    keys = [(proto, None), (None, None)]
+    if port:
+        keys += [(proto, port), (None, port)]
+    merged = sorted(e for b in map(_rule_index.get, keys) if b for e in b)
+    _candidate_cache[(proto, port)] = merged
+    return merged
+
+
 def _check_rules(pkt_info: dict) -> list[dict]:
-    triggered = []
-    for rule in IDS_RULES:
-        if rule["proto"] and rule["proto"] != pkt_info.get("protocol"):
-            continue
-        if rule["dst_port"] and rule["dst_port"] != pkt_info.get("dst_port"):
-            continue
-        if rule["flags"] and rule["flags"] not in (pkt_info.get("flags") or ""):
-            continue
-        triggered.append(rule)
-    return triggered
-
-
-def _save_packet(pkt_info: dict, alert_triggered: bool):
-    conn = get_conn()
-    conn.execute("""
-        INSERT INTO packets (timestamp,src_ip,dst_ip,src_port,dst_port,protocol,
-                             length,flags,payload_preview,alert_triggered)
-        VALUES (:timestamp,:src_ip,:dst_ip,:src_port,:dst_port,:protocol,
-                :length,:flags,:payload_preview,:alert_triggered)
-    """, {**pkt_info, "alert_triggered": int(alert_triggered)})
-    conn.commit()
-    conn.close()
-
-
-def _save_alert(pkt_info: dict, rule: dict):
-    conn = get_conn()
-    conn.execute("""
-        INSERT INTO alerts (timestamp,title,description,severity,category,
-                            src_ip,dst_ip,src_port,dst_port,protocol,rule_id,status)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        pkt_info["timestamp"],
-        rule["name"],
-        f"{rule['name']} from {pkt_info.get('src_ip')} to {pkt_info.get('dst_ip')}:{pkt_info.get('dst_port')}",
-        rule["severity"],
-        rule["category"],
-        pkt_info.get("src_ip"),
-        pkt_info.get("dst_ip"),
-        pkt_info.get("src_port"),
-        pkt_info.get("dst_port"),
-        pkt_info.get("protocol"),
-        rule["id"],
-        "open",
-    ))
-    conn.commit()
-    conn.close()
-    _send_alert_notification(rule, pkt_info)
+    proto = pkt_info.get("protocol")
+    port = pkt_info.get("dst_port")
+    candidates = _candidate_cache.get((proto, port))
+    if candidates is None:
+        candidates = _candidates(proto, port)
+    if not candidates:
+        return []
+    pkt_mask = _flags_mask(pkt_info.get("flags"))
+    return [rule for _, mask, rule in candidates if mask & pkt_mask == mask]
+
+
+_rule_index = compile_rules(IDS_RULES)
+_candidate_cache = {}
+
+
+def _evaluate(pkt_info: dict, now: float, tracker: ThresholdTracker = None) -> list[dict]:
+    tracker = tracker or _thresholds
+    return [rule for rule in _check_rules(pkt_info)
+            if "threshold" not in rule or tracker.observe(rule, pkt_info, now)]
+
+
+def _ensure_writer():
+    global _packet_queue, _writer_thread
+    with _writer_lock:
+        if _writer_thread and _writer_thread.is_alive():
+            return
+        cfg = load_config()
+        if _packet_queue is None:
+            _packet_queue = queue.Queue(maxsize=int(cfg.get("packet_queue_size", 10000)))
+        _writer_thread = threading.Thread(
+            target=_writer_loop,
+            args=(int(cfg.get("packet_batch_size", 500)), int(cfg.get("packet_flush_ms", 250)) / 1000),
+            daemon=True,
+        )
+        _writer_thread.start()
+
+
+def _writer_loop(batch_size: int, flush_interval: float):
+    batch = []
+    deadline = time.monotonic() + flush_interval
+    while True:
+        timeout = deadline - time.monotonic()
+        try:
+            if timeout > 0:
+                batch.append(_packet_queue.get(timeout=timeout))
+        except queue.Empty:
+            pass
+        if len(batch) >= batch_size or time.monotonic() >= deadline:
+            if batch:
+                _flush_packets(batch)
+                for _ in batch:
+                    _packet_queue.task_done()
+                batch = []
+            if time.monotonic() >= deadline:
+                _flush_alert_counts()
+                _flush_flows()
+                deadline = time.monotonic() + flush_interval
+
+
+def _flush_packets(batch: list[dict]):
+    started = time.perf_counter()
+    try:
+        write_packets(batch)
+        _writer_stats["written"] += len(batch)
+    except Exception as e:
+        _writer_stats["failed"] += len(batch)
+        _writer_stats["last_error"] = f"packets: {type(e).__name__}: {e}"
+    else:
+        if events.has_subscribers():
+            events.publish("packets", {"count": len(batch),
+                                       "alerts": sum(p["alert_triggered"] for p in batch),
+                                       "rows": [{k: p.get(k) for k in STREAM_FIELDS} for p in batch[-STREAM_ROWS:]]})
+    elapsed = (time.perf_counter() - started) * 1000
+    _writer_stats["flushes"] += 1
+    _writer_stats["last_batch"] = len(batch)
+    _writer_stats["last_flush_ms"] = round(elapsed, 2)
+    _writer_stats["max_flush_ms"] = round(max(_writer_stats["max_flush_ms"], elapsed), 2)
+
+
+def _save_packet(pkt_info: dict, alert_triggered: bool, block: bool = False):
+    _ensure_writer()
+    try:
+        _packet_queue.put({**pkt_info, "alert_triggered": int(alert_triggered)}, block=block)
+    except queue.Full:
+        _writer_stats["dropped"] += 1
+
+
+def _should_store(alert_triggered: bool) -> bool:
+    global _store_policy, _store_seq
+    if _store_policy is None:
+        cfg = load_config()
+        _store_policy = (cfg.get("packet_store_mode", "all"), max(1, int(cfg.get("packet_sample_rate", 100))))
+    mode, rate = _store_policy
+    if mode == "all":
+        return True
+    if mode == "none":
+        return False
+    if alert_triggered:
+        return True
+    if mode == "sampled":
+        _store_seq += 1
+        return _store_seq % rate == 0
+    return False
+
+
+def _store_packet(pkt_info: dict, rules_triggered: list[dict], now: float, block: bool = False):
+    if _flow_tracking:
+        _flows.observe(pkt_info, len(rules_triggered), now)
+    if _should_store(bool(rules_triggered)):
+        _save_packet(pkt_info, bool(rules_triggered), block)
+
+
+def _flush_failed(what: str, e: Exception):
+    _writer_stats["flush_errors"] += 1
+    _writer_stats["last_error"] = f"{what}: {type(e).__name__}: {e}"
+
+
+def _flush_flows(force: bool = False):
+    """Export expired flows; rows that fail to insert are retried on the next flush."""
+    global _flow_flush_at, _flow_retry
+    if not force and time.monotonic() < _flow_flush_at:
+        return
+    _flow_flush_at = time.monotonic() + 1.0
+    rows = _flow_retry + _flows.expire(force)
+    _flow_retry = []
+    if rows:
+        try:
+            with connection() as conn:
+                conn.executemany(FLOW_INSERT, rows)
+        except Exception as e:
+            _flush_failed("flows", e)
+            _writer_stats["flows_dropped"] += max(0, len(rows) - MAX_PENDING_FLOWS)
+            _flow_retry = rows[-MAX_PENDING_FLOWS:]
+    _writer_stats["flows_pending"] = len(_flow_retry)
+
+
+def drain_writer(timeout: float = 30) -> bool:
+    deadline = time.monotonic() + timeout
+    while _packet_queue and _packet_queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    _flush_alert_counts()
+    _flush_flows(force=True)
+    return True
+
+
+def _save_alert(pkt_info: dict, rule: dict, now: float = None):
+    key = (rule["id"], pkt_info.get("src_ip"), pkt_info.get("dst_ip"), pkt_info.get("dst_port"))
+    now = now or time.time()
+    window = _dedup_window()
+    with _agg_lock:
+        entry = _alert_agg.get(key)
+        if entry and now - entry["first"] < window:
+            entry["pending"] += 1
+            entry["last_seen"] = pkt_info["timestamp"]
+            _alert_agg.move_to_end(key)
+            return
+    with connection() as conn:
+        row = _find_open_alert(conn, key, now - window) if window and not entry else None
+        if row:
+            conn.execute("UPDATE alerts SET count = count + 1, last_seen = ? WHERE id = ?",
+                         (pkt_info["timestamp"], row["id"]))
+            alert_id, first = row["id"], row["first"]
+        else:
+            alert_id = conn.execute("""
+                INSERT INTO alerts (timestamp,title,description,severity,category,
+                                    src_ip,dst_ip,src_port,dst_port,protocol,rule_id,status,
+                                    count,first_seen,last_seen)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,1,?,?)
+            """, (
+                pkt_info["timestamp"],
+                rule["name"],
+                pkt_info.get("description") or
+                f"{rule['name']} from {pkt_info.get('src_ip')} to {pkt_info.get('dst_ip')}:{pkt_info.get('dst_port')}",
+                rule["severity"],
+                rule["category"],
+                pkt_info.get("src_ip"),
+                pkt_info.get("dst_ip"),
+                pkt_info.get("src_port"),
+                pkt_info.get("dst_port"),
+                pkt_info.get("protocol"),
+                rule["id"],
+                "open",
+                pkt_info["timestamp"],
+                pkt_info["timestamp"],
+            )).lastrowid
+            first = now
+    cache.bump("alerts")
+    if window:
+        with _agg_lock:
+            expired = _alert_agg.get(key)
+            if expired and expired["pending"]:
+                _agg_evicted.append(expired)
+            _alert_agg[key] = {"id": alert_id, "first": first, "pending": 0, "last_seen": pkt_info["timestamp"]}
+            while len(_alert_agg) > MAX_AGGREGATED_ALERTS:
+                _, evicted = _alert_agg.popitem(last=False)
+                if evicted["pending"]:
+                    _agg_evicted.append(evicted)
+    if not row:
+        events.publish("alert", {"id": alert_id, "timestamp": pkt_info["timestamp"], "title": rule["name"],
+                                 "severity": rule["severity"], "category": rule["category"],
+                                 "src_ip": pkt_info.get("src_ip"), "dst_ip": pkt_info.get("dst_ip"),
+                                 "dst_port": pkt_info.get("dst_port"), "status": "open", "count": 1})
+        _send_alert_notification(rule, pkt_info)
+
+
+def _dedup_window() -> float:
+    global _alert_window
+    if _alert_window is None:
+        _alert_window = float(load_config().get("alert_dedup_window_seconds", 300))
+    return _alert_window
+
+
+def _find_open_alert(conn, key: tuple, since: float):
+    since_ts = datetime.fromtimestamp(since, timezone.utc).isoformat()
+    row = conn.execute("""
+        SELECT id, first_seen FROM alerts
+        WHERE rule_id=? AND src_ip IS ? AND dst_ip IS ? AND dst_port IS ?
+          AND status='open' AND first_seen >= ?
+        ORDER BY first_seen DESC LIMIT 1
+    """, (*key, since_ts)).fetchone()
+    if not row:
+        return None
+    try:
+        first = datetime.fromisoformat(row["first_seen"]).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return {"id": row["id"], "first": first}
+
+
+def _flush_alert_counts():
+    # Evicted entries are older than live ones, so they go first and last_seen ends up newest.
+    with _agg_lock:
+        updates = [(e["pending"], e["last_seen"], e["id"]) for e in _agg_evicted]
+        updates += [(e["pending"], e["last_seen"], e["id"]) for e in _alert_agg.values() if e["pending"]]
+        for e in _alert_agg.values():
+            e["pending"] = 0
+        _agg_evicted.clear()
+    if not updates:
+        return
+    try:
+        with connection() as conn:
+            conn.executemany("UPDATE alerts SET count = count + ?, last_seen = ? WHERE id = ?", updates)
+    except Exception as e:
+        _flush_failed("alert counts", e)
+        with _agg_lock:
+            _agg_evicted[:0] = [{"id": i, "pending": n, "last_seen": seen} for n, seen, i in updates]
+        return
+    cache.bump("alerts")
 
 
 def _send_alert_notification(rule: dict, pkt_info: dict):
@@ -77,72 +358,163 @@ def _send_alert_notification(rule: dict, pkt_info: dict):
     send_alert(
         title=rule["name"],
         severity=rule["severity"],
-        description=f"{rule['name']} from {pkt_info.get('src_ip')} → {pkt_info.get('dst_ip')}:{pkt_info.get('dst_port')}",
+        description=pkt_info.get("description") or
+        f"{rule['name']} from {pkt_info.get('src_ip')} → {pkt_info.get('dst_ip')}:{pkt_info.get('dst_port')}",
     )
 
 
-def _packet_handler(pkt):
+def _scapy_layers():
+    global _layers
+    if _layers is None:
+        from scapy.layers.inet import IP, TCP, UDP, ICMP
+        from scapy.packet import Raw
+        _layers = (IP, TCP, UDP, ICMP, Raw)
+    return _layers
+
+
+_layers = None
+
+
+def _scapy_packet_info(pkt) -> dict | None:
+    IP, TCP, UDP, ICMP, Raw = _scapy_layers()
+    ip = pkt.getlayer(IP)
+    if ip is None:
+        return None
+    proto = "OTHER"
+    src_port = dst_port = flags = None
+    layer = ip.payload
+    if isinstance(layer, TCP):
+        proto = "TCP"
+        src_port, dst_port = layer.sport, layer.dport
+        flags = str(layer.flags)
+    elif isinstance(layer, UDP):
+        proto = "UDP"
+        src_port, dst_port = layer.sport, layer.dport
+    elif isinstance(layer, ICMP):
+        proto = "ICMP"
+
+    raw = pkt.getlayer(Raw)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "src_ip": ip.src, "dst_ip": ip.dst,
+        "src_port": src_port, "dst_port": dst_port,
+        "protocol": proto, "length": len(pkt),
+        "flags": flags, "payload_preview": bytes(raw.load[:PREVIEW_BYTES]).hex() if raw else "",
+    }
+
+
+def _process_packet(pkt_info: dict):
+    _record_result(pkt_info, _evaluate(pkt_info, time.time()))
+
+
+def _record_result(pkt_info: dict, rules_triggered: list[dict]):
     global _captured_count
+    _store_packet(pkt_info, rules_triggered, time.time())
+    for rule in rules_triggered:
+        _save_alert(pkt_info, rule)
+    _captured_count += 1
+
+
+def _decode_and_process(data: bytes, linktype: int, ts: float):
     try:
-        from scapy.layers.inet import IP, TCP, UDP, ICMP
-        if not pkt.haslayer(IP):
-            return
-        ip = pkt[IP]
-        proto = "OTHER"
-        src_port = dst_port = flags = None
-        if pkt.haslayer(TCP):
-            proto = "TCP"
-            src_port = pkt[TCP].sport
-            dst_port = pkt[TCP].dport
-            flags = str(pkt[TCP].flags)
-        elif pkt.haslayer(UDP):
-            proto = "UDP"
-            src_port = pkt[UDP].sport
-            dst_port = pkt[UDP].dport
-        elif pkt.haslayer(ICMP):
-            proto = "ICMP"
-
-        payload_preview = ""
-        if pkt.haslayer("Raw"):
-            payload_preview = bytes(pkt["Raw"].load[:64]).hex()
-
-        pkt_info = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "src_ip": ip.src, "dst_ip": ip.dst,
-            "src_port": src_port, "dst_port": dst_port,
-            "protocol": proto, "length": len(pkt),
-            "flags": flags, "payload_preview": payload_preview,
-        }
-        rules_triggered = _check_rules(pkt_info)
-        _save_packet(pkt_info, bool(rules_triggered))
-        for rule in rules_triggered:
-            _save_alert(pkt_info, rule)
-        _captured_count += 1
+        pkt_info = decode_frame(data, linktype, ts)
+        if pkt_info:
+            _process_packet(pkt_info)
+    except Exception:
+        pass
+
+
+def _packet_handler(pkt):
+    try:
+        pkt_info = _scapy_packet_info(pkt)
+        if pkt_info:
+            _process_packet(pkt_info)
     except Exception:
         pass
 
 
+def _capture_filter(cfg: dict) -> str | None:
+    setting = cfg.get("capture_filter", "auto")
+    if setting == "auto":
+        # Flow records need every packet of both directions; the rule prefilter would keep only SYNs
+        # and watched ports, so it is used only when flow tracking is off.
+        return "ip" if cfg.get("flow_tracking", True) else build_bpf_filter(IDS_RULES)
+    return setting or None
+
+
+def _flow_coverage(bpf: str | None) -> str:
+    """'all' when the kernel filter passes every IP packet, else flows only count what the filter lets through."""
+    if not _flow_tracking:
+        return "disabled"
+    return "all" if bpf in (None, "", "ip") else "filtered"
+
+
+def _sniff_raw(iface: str, bpf: str | None, packet_count: int, on_frame, on_idle=None):
+    from scapy.all import conf
+    sock = conf.L2listen(iface=iface, filter=bpf)
+    try:
+        seen = 0
+        while _capture_running and (not packet_count or seen < packet_count):
+            if not select.select([sock], [], [], 0.05 if on_idle else 0.5)[0]:
+                if on_idle:
+                    on_idle()
+                continue
+            cls, data, ts = sock.recv_raw()
+            if not data:
+                continue
+            seen += 1
+            on_frame(data, LINKTYPES.get(getattr(cls, "__name__", ""), DLT_EN10MB), ts)
+    finally:
+        sock.close()
+
+
 def start_capture(interface: str = None, packet_count: int = 0):
-    global _capture_running, _capture_thread, _captured_count
+    global _capture_running, _capture_thread, _captured_count, _alert_window, _capture_info, _pipeline
+    global _flows, _flow_tracking, _store_policy
     if _capture_running:
         return {"status": "already running"}
     try:
         from scapy.all import sniff
         cfg = load_config()
         iface = interface or cfg.get("interface", "eth0")
+        _flow_tracking = bool(cfg.get("flow_tracking", True))
+        bpf = _capture_filter(cfg)
+        decoder = cfg.get("capture_decoder", "scapy")
+        workers = int(cfg.get("capture_workers", 0))
+        if workers > 0:
+            decoder = "fast"
+        _alert_window = float(cfg.get("alert_dedup_window_seconds", 300))
+        _store_policy = None
+        _flows = FlowTable(float(cfg.get("flow_idle_timeout", 15)), float(cfg.get("flow_active_timeout", 1800)))
         _capture_running = True
         _captured_count = 0
+        _capture_info = {"interface": iface, "filter": bpf, "decoder": decoder, "workers": workers,
+                         "flow_coverage": _flow_coverage(bpf)}
+        _ensure_writer()
+        _pipeline = ShardedPipeline(workers, IDS_RULES, _record_result) if workers > 0 else None
+        if _pipeline:
+            _pipeline.start()
 
         def _run():
             global _capture_running
-            sniff(iface=iface, prn=_packet_handler,
-                  count=packet_count, store=False,
-                  stop_filter=lambda x: not _capture_running)
-            _capture_running = False
+            try:
+                if _pipeline:
+                    _sniff_raw(iface, bpf, packet_count, _pipeline.submit, _pipeline.flush)
+                elif decoder == "fast":
+                    _sniff_raw(iface, bpf, packet_count, _decode_and_process)
+                else:
+                    sniff(iface=iface, prn=_packet_handler, filter=bpf,
+                          count=packet_count, store=False,
+                          stop_filter=lambda x: not _capture_running)
+            finally:
+                _capture_running = False
+                if _pipeline:
+                    _pipeline.close()
+                drain_writer()
 
         _capture_thread = threading.Thread(target=_run, daemon=True)
         _capture_thread.start()
-        return {"status": "started", "interface": iface}
+        return {"status": "started", **_capture_info}
     except ImportError:
         return {"error": "scapy not installed"}
     except Exception as e:
@@ -157,20 +529,41 @@ def stop_capture():
 
 
 def capture_status() -> dict:
-    return {"running": _capture_running, "captured": _captured_count}
+    return {
+        "running": _capture_running,
+        "captured": _captured_count,
+        **_capture_info,
+        "queue_depth": _packet_queue.qsize() if _packet_queue else 0,
+        "pipeline": _pipeline.status() if _pipeline else None,
+        "flows": {**_flows.status(), "coverage": _capture_info.get("flow_coverage", _flow_coverage(None))},
+        "packet_store_mode": (_store_policy or ("all",))[0],
+        "writer": dict(_writer_stats),
+        "thresholds": _thresholds.stats(),
+    }
+
 
+def get_recent_packets(limit: int = 100, cursor: str = None, since: str = None, until: str = None) -> dict:
+    result = page_packets("1=1", [], limit, cursor, since, until)
+    return {"packets": result["rows"], "next": result["next"], "prev": result["prev"]}
 
-def get_recent_packets(limit: int = 100) -> list[dict]:
-    conn = get_conn()
-    rows = conn.execute(
-        "SELECT * FROM packets ORDER BY created_at DESC LIMIT ?", (limit,)
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+
+def get_flows(src_ip: str = None, dst_ip: str = None, protocol: str = None,
+              limit: int = 100, cursor: str = None) -> dict:
+    sql = "SELECT * FROM flows WHERE 1=1"
+    params = []
+    for col, val in (("src_ip", src_ip), ("dst_ip", dst_ip), ("protocol", protocol)):
+        if val:
+            sql += f" AND {col}=?"
+            params.append(val)
+    with connection() as conn:
+        result = keyset_page(conn, sql, params, ("last_seen", "id"), limit, cursor)
+    return {"flows": result["rows"], "next": result["next"], "prev": result["prev"],
+            "active": _flows.status()["active"],
+            "coverage": _capture_info.get("flow_coverage", _flow_coverage(None))}
 
 
-def get_alerts(status: str = None, severity: str = None, page: int = 1, page_size: int = 50) -> dict:
-    conn = get_conn()
+def get_alerts(status: str = None, severity: str = None, page: int = 1, page_size: int = 50,
+               cursor: str = None, total: str = "approx") -> dict:
     conditions = ["1=1"]
     params = []
     if status:
@@ -180,28 +573,32 @@ def get_alerts(status: str = None, severity: str = None, page: int = 1, page_siz
         conditions.append("severity=?")
         params.append(severity)
     where = " AND ".join(conditions)
-    total = conn.execute(f"SELECT COUNT(*) FROM alerts WHERE {where}", params).fetchone()[0]
-    offset = (page - 1) * page_size
-    rows = conn.execute(
-        f"SELECT * FROM alerts WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
-        params + [page_size, offset]
-    ).fetchall()
-    conn.close()
-    return {"total": total, "alerts": [dict(r) for r in rows]}
+    with connection() as conn:
+        count = count_rows(conn, "alerts", where, params, total)
+        result = keyset_page(conn, f"SELECT * FROM alerts WHERE {where}", params,
+                             ("created_at", "id"), page_size, cursor, offset=(page - 1) * page_size)
+    return {"total": count, "alerts": result["rows"], "next": result["next"], "prev": result["prev"]}
 
 
 def update_alert_status(alert_id: int, status: str):
-    conn = get_conn()
-    conn.execute("UPDATE alerts SET status=? WHERE id=?", (status, alert_id))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("UPDATE alerts SET status=? WHERE id=?", (status, alert_id))
+    cache.bump("alerts")
+    # Later hits must not keep counting into an alert the analyst has closed;
+    # the next one goes through _find_open_alert and opens a fresh alert.
+    with _agg_lock:
+        for key in [k for k, e in _alert_agg.items() if e["id"] == alert_id]:
+            evicted = _alert_agg.pop(key)
+            if evicted["pending"]:
+                _agg_evicted.append(evicted)
 
 
 def get_alert_stats() -> dict:
-    conn = get_conn()
-    total = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
-    open_c = conn.execute("SELECT COUNT(*) FROM alerts WHERE status='open'").fetchone()[0]
-    by_sev = {r[0]: r[1] for r in conn.execute("SELECT severity, COUNT(*) FROM alerts GROUP BY severity")}
-    by_cat = {r[0]: r[1] for r in conn.execute("SELECT category, COUNT(*) FROM alerts GROUP BY category")}
-    conn.close()
-    return {"total": total, "open": open_c, "by_severity": by_sev, "by_category": by_cat}
+    with connection() as conn:
+        counters = read_counters(conn, "alerts")
+    return {
+        "total": counters.get("total", {}).get(None, 0),
+        "open": counters.get("status", {}).get("open", 0),
+        "by_severity": counters.get("severity", {}),
+        "by_category": counters.get("category", {}),
+    }
@@ -3,8 +3,29 @@ import csv
 import json
 import re
 import os
+import gzip
+import time
+import codecs
+import itertools
+import ipaddress
+import collections
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from modules.database import get_conn
+from modules.database import connection, keyset_page, count_rows, read_counters, to_db_time, FTS_AVAILABLE
+from modules import events, cache
+
+CHUNK_SIZE = 1 << 20
+MAX_RECORD_SIZE = 16 << 20
+INGEST_BATCH_SIZE = 1000
+MAX_TRACKED_UPLOADS = 20
+BULK_BLOCK_SIZE = 4 << 20
+BULK_LOG_RE = re.compile(r"\.(log|txt|json|ndjson|csv)(\.\d+)?$|(syslog|messages|secure|auth\.log)(\.\d+)?$", re.I)
+
+LOG_COLUMNS = ("timestamp", "message", "host_name", "log_source", "log_type", "severity",
+               "program", "src_ip", "dst_ip", "src_port", "dst_port", "protocol", "service", "raw")
+LOG_INSERT = f"INSERT INTO logs ({','.join(LOG_COLUMNS)}) VALUES ({','.join('?' * len(LOG_COLUMNS))})"
+
+_ingest_progress = {}
 
 SYSLOG_RE = re.compile(
     r"(?P<month>\w{3})\s+(?P<day>\d+)\s+(?P<time>\d{2}:\d{2}:\d{2})\s+"
@@ -52,69 +73,161 @@ def parse_syslog_line(line: str, filename: str) -> dict | None:
 
 
 def parse_txt(content: str, filename: str) -> list[dict]:
-    return [r for line in content.splitlines() if (r := parse_syslog_line(line, filename))]
+    return list(iter_txt(content.splitlines(), filename))
 
 
 def parse_json(content: str, filename: str) -> list[dict]:
-    records = []
-    try:
-        data = json.loads(content)
-        items = data if isinstance(data, list) else [data]
-    except json.JSONDecodeError:
-        items = []
-        for line in content.splitlines():
-            line = line.strip()
-            if not line:
+    return list(iter_json(iter([content]), filename))
+
+
+def parse_csv(content: str, filename: str) -> list[dict]:
+    return list(iter_csv(io.StringIO(content), filename))
+
+
+def iter_chunks(f, progress: dict | None = None):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while chunk := f.read(CHUNK_SIZE):
+        if progress is not None:
+            progress["bytes"] += len(chunk)
+        if text := decoder.decode(chunk):
+            yield text
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+def iter_lines(chunks):
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_txt(lines, filename: str):
+    for line in lines:
+        if r := parse_syslog_line(line, filename):
+            yield r
+
+
+def iter_json(chunks, filename: str):
+    for item in _iter_json_items(chunks):
+        if isinstance(item, dict):
+            yield _json_record(item, filename)
+
+
+def iter_csv(lines, filename: str):
+    for row in csv.DictReader(lines):
+        yield _csv_record(row, filename)
+
+
+def _iter_json_items(chunks):
+    consumed = []
+    for chunk in chunks:
+        consumed.append(chunk)
+        if chunk.strip():
+            break
+    head = "".join(consumed).lstrip()
+    if not head:
+        return
+    rest = itertools.chain([head], chunks)
+    if head[0] == "[":
+        yield from _iter_json_array(rest)
+    else:
+        yield from _iter_ndjson(iter_lines(rest))
+
+
+def _iter_json_array(chunks):
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    opened = False
+    for chunk in chunks:
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not opened:
+                opened = True
+                pos += 1
                 continue
+            if buf[pos] == "]":
+                return
             try:
-                items.append(json.loads(line))
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if len(buf) - pos > MAX_RECORD_SIZE:
+                    return
+                break
+            yield item
+
+
+def _iter_ndjson(lines):
+    pending = ""
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped[0] == "{":
+            try:
+                item = json.loads(stripped)
+                pending = ""
+                yield item
+                continue
             except json.JSONDecodeError:
                 pass
-    for item in items:
-        if not isinstance(item, dict):
+        pending += line
+        try:
+            item = json.loads(pending)
+        except json.JSONDecodeError:
+            if len(pending) > MAX_RECORD_SIZE:
+                pending = ""
             continue
-        records.append({
-            "timestamp":  item.get("timestamp") or item.get("time") or item.get("@timestamp") or datetime.now(timezone.utc).isoformat(),
-            "message":    item.get("message") or item.get("msg") or json.dumps(item),
-            "host_name":  item.get("host") or item.get("hostname"),
-            "program":    item.get("program") or item.get("process") or item.get("app"),
-            "log_source": filename,
-            "log_type":   item.get("log_type") or item.get("type") or "system",
-            "severity":   item.get("severity") or item.get("level") or detect_severity(str(item)),
-            "src_ip":     item.get("src_ip") or item.get("source_ip") or item.get("src"),
-            "dst_ip":     item.get("dst_ip") or item.get("dest_ip") or item.get("dst"),
-            "src_port":   item.get("src_port") or item.get("sport"),
-            "dst_port":   item.get("dst_port") or item.get("dport"),
-            "protocol":   item.get("protocol") or item.get("proto"),
-            "service":    item.get("service") or item.get("app_proto"),
-            "raw":        json.dumps(item),
-        })
-    return records
+        pending = ""
+        yield item
 
 
-def parse_csv(content: str, filename: str) -> list[dict]:
-    records = []
-    reader = csv.DictReader(io.StringIO(content))
-    for row in reader:
-        r = {k.lower().strip(): v for k, v in row.items()}
-        record = {
-            "timestamp":  r.get("timestamp") or r.get("time") or r.get("date") or datetime.now(timezone.utc).isoformat(),
-            "message":    r.get("message") or r.get("msg") or r.get("description") or str(dict(row)),
-            "host_name":  r.get("host") or r.get("hostname"),
-            "program":    r.get("program") or r.get("process"),
-            "log_source": filename,
-            "log_type":   r.get("type") or r.get("log_type") or "system",
-            "severity":   r.get("severity") or r.get("level") or detect_severity(str(row)),
-            "src_ip":     r.get("src_ip") or r.get("source_ip"),
-            "dst_ip":     r.get("dst_ip") or r.get("dest_ip"),
-            "src_port":   _int(r.get("src_port") or r.get("sport")),
-            "dst_port":   _int(r.get("dst_port") or r.get("dport")),
-            "protocol":   r.get("protocol") or r.get("proto"),
-            "service":    r.get("service"),
-            "raw":        json.dumps(dict(row)),
-        }
-        records.append(record)
-    return records
+def _json_record(item: dict, filename: str) -> dict:
+    return {
+        "timestamp":  item.get("timestamp") or item.get("time") or item.get("@timestamp") or datetime.now(timezone.utc).isoformat(),
+        "message":    item.get("message") or item.get("msg") or json.dumps(item),
+        "host_name":  item.get("host") or item.get("hostname"),
+        "program":    item.get("program") or item.get("process") or item.get("app"),
+        "log_source": filename,
+        "log_type":   item.get("log_type") or item.get("type") or "system",
+        "severity":   item.get("severity") or item.get("level") or detect_severity(str(item)),
+        "src_ip":     item.get("src_ip") or item.get("source_ip") or item.get("src"),
+        "dst_ip":     item.get("dst_ip") or item.get("dest_ip") or item.get("dst"),
+        "src_port":   item.get("src_port") or item.get("sport"),
+        "dst_port":   item.get("dst_port") or item.get("dport"),
+        "protocol":   item.get("protocol") or item.get("proto"),
+        "service":    item.get("service") or item.get("app_proto"),
+        "raw":        json.dumps(item),
+    }
+
+
+def _csv_record(row: dict, filename: str) -> dict:
+    r = {k.lower().strip(): v for k, v in row.items() if k}
+    return {
+        "timestamp":  r.get("timestamp") or r.get("time") or r.get("date") or datetime.now(timezone.utc).isoformat(),
+        "message":    r.get("message") or r.get("msg") or r.get("description") or str(dict(row)),
+        "host_name":  r.get("host") or r.get("hostname"),
+        "program":    r.get("program") or r.get("process"),
+        "log_source": filename,
+        "log_type":   r.get("type") or r.get("log_type") or "system",
+        "severity":   r.get("severity") or r.get("level") or detect_severity(str(row)),
+        "src_ip":     r.get("src_ip") or r.get("source_ip"),
+        "dst_ip":     r.get("dst_ip") or r.get("dest_ip"),
+        "src_port":   _int(r.get("src_port") or r.get("sport")),
+        "dst_port":   _int(r.get("dst_port") or r.get("dport")),
+        "protocol":   r.get("protocol") or r.get("proto"),
+        "service":    r.get("service"),
+        "raw":        json.dumps(dict(row)),
+    }
 
 
 def _int(v):
@@ -124,49 +237,208 @@ def _int(v):
         return None
 
 
-def ingest_records(records: list[dict]) -> tuple[int, int]:
-    conn = get_conn()
+def ingest_records(records) -> tuple[int, int]:
+    return ingest_stream(records)
+
+
+def ingest_stream(records, progress: dict | None = None, on_progress=None,
+                  batch_size: int = INGEST_BATCH_SIZE) -> tuple[int, int]:
+    return ingest_rows((_row(r) for r in records), progress, on_progress, batch_size)
+
+
+def ingest_rows(rows, progress: dict | None = None, on_progress=None,
+                batch_size: int = INGEST_BATCH_SIZE) -> tuple[int, int]:
     ok = 0
     err = 0
-    for r in records:
-        try:
-            conn.execute("""
-                INSERT INTO logs (timestamp,message,host_name,log_source,log_type,severity,
-                                  program,src_ip,dst_ip,src_port,dst_port,protocol,service,raw)
-                VALUES (:timestamp,:message,:host_name,:log_source,:log_type,:severity,
-                        :program,:src_ip,:dst_ip,:src_port,:dst_port,:protocol,:service,:raw)
-            """, r)
-            ok += 1
-        except Exception:
-            err += 1
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        for batch in _batched(rows, batch_size):
+            failed = 0
+            try:
+                conn.executemany(LOG_INSERT, batch)
+            except Exception:
+                conn.rollback()
+                for row in batch:
+                    try:
+                        conn.execute(LOG_INSERT, row)
+                    except Exception:
+                        failed += 1
+            conn.commit()
+            cache.bump("logs")
+            ok += len(batch) - failed
+            err += failed
+            if progress is not None:
+                progress["records"] += len(batch)
+                progress["indexed"] += len(batch) - failed
+                progress["errors"] += failed
+                if on_progress:
+                    on_progress(dict(progress))
     return ok, err
 
 
-def process_upload(file_path: str, filename: str) -> dict:
-    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
-        content = f.read()
-    ext = os.path.splitext(filename)[1].lower()
-    if ext == ".json":
-        records = parse_json(content, filename)
-    elif ext == ".csv":
-        records = parse_csv(content, filename)
+def _row(record: dict) -> tuple:
+    return tuple(record.get(c) for c in LOG_COLUMNS)
+
+
+def _batched(iterable, size: int):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def process_upload(file_path: str, filename: str, on_progress=None) -> dict:
+    progress = {"filename": filename, "bytes": 0, "total_bytes": os.path.getsize(file_path),
+                "records": 0, "indexed": 0, "errors": 0, "done": False}
+    _ingest_progress[filename] = progress
+    while len(_ingest_progress) > MAX_TRACKED_UPLOADS:
+        _ingest_progress.pop(next(iter(_ingest_progress)))
+    try:
+        with open(file_path, "rb") as f:
+            chunks = iter_chunks(f, progress)
+            ext = os.path.splitext(filename)[1].lower()
+            if ext == ".json":
+                records = iter_json(chunks, filename)
+            elif ext == ".csv":
+                records = iter_csv(iter_lines(chunks), filename)
+            else:
+                records = iter_txt(iter_lines(chunks), filename)
+            indexed, errors = ingest_stream(records, progress, on_progress)
+    finally:
+        progress["done"] = True
+    events.publish("logs", {"filename": filename, "total": progress["records"], "indexed": indexed, "errors": errors})
+    return {"total": progress["records"], "indexed": indexed, "errors": errors}
+
+
+def get_ingest_progress(filename: str = None) -> dict:
+    if filename:
+        return dict(_ingest_progress.get(filename) or {})
+    return {name: dict(p) for name, p in _ingest_progress.items()}
+
+
+def _log_kind(filename: str) -> str:
+    name = filename[:-3] if filename.endswith(".gz") else filename
+    ext = os.path.splitext(name)[1].lower()
+    return {".json": "json", ".ndjson": "json", ".csv": "csv"}.get(ext, "txt")
+
+
+def _open_log(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _iter_blocks(f, progress: dict, block_size: int):
+    pending = b""
+    while chunk := f.read(block_size):
+        progress["bytes"] += len(chunk)
+        data = pending + chunk
+        cut = data.rfind(b"\n") + 1
+        if not cut:
+            pending = data
+            continue
+        pending = data[cut:]
+        yield data[:cut]
+    if pending:
+        yield pending
+
+
+def _parse_block(data: bytes, filename: str, kind: str, header: str) -> list[tuple]:
+    lines = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    if kind == "csv":
+        records = iter_csv(itertools.chain([header], lines), filename)
+    elif kind == "json":
+        records = (_json_record(i, filename) for i in _iter_ndjson(lines) if isinstance(i, dict))
     else:
-        records = parse_txt(content, filename)
-    if not records:
-        return {"total": 0, "indexed": 0, "errors": 0}
-    indexed, errors = ingest_records(records)
-    return {"total": len(records), "indexed": indexed, "errors": errors}
+        records = iter_txt(lines, filename)
+    return [_row(r) for r in records]
+
+
+def bulk_import_file(path: str, executor: ProcessPoolExecutor, workers: int, filename: str = None,
+                     on_progress=None, block_size: int = BULK_BLOCK_SIZE) -> dict:
+    filename = filename or os.path.basename(path)
+    kind = _log_kind(filename)
+    started = time.monotonic()
+    with _open_log(path) as f:
+        head = f.peek(64)[:64] if hasattr(f, "peek") else b""
+        if kind == "json" and head.lstrip().startswith(b"["):
+            records = iter_json(iter_chunks(f), filename)
+            indexed, errors = ingest_stream(records)
+            return {"file": filename, "total": indexed + errors, "indexed": indexed,
+                    "errors": errors, "seconds": round(time.monotonic() - started, 2)}
+        header = f.readline().decode("utf-8", errors="replace") if kind == "csv" else ""
+        total_bytes = None if path.endswith(".gz") else os.path.getsize(path)
+        progress = {"filename": filename, "bytes": len(header), "total_bytes": total_bytes,
+                    "records": 0, "indexed": 0, "errors": 0, "done": False}
+        in_flight = collections.deque()
+        for block in _iter_blocks(f, progress, block_size):
+            in_flight.append(executor.submit(_parse_block, block, filename, kind, header))
+            if len(in_flight) >= workers * 2:
+                ingest_rows(in_flight.popleft().result(), progress, on_progress)
+        while in_flight:
+            ingest_rows(in_flight.popleft().result(), progress, on_progress)
+    progress["done"] = True
+    return {"file": filename, "total": progress["records"], "indexed": progress["indexed"],
+            "errors": progress["errors"], "seconds": round(time.monotonic() - started, 2)}
+
+
+def bulk_import_dir(directory: str, workers: int = None, recursive: bool = True,
+                    on_file=None, on_progress=None) -> list[dict]:
+    if os.path.isfile(directory):
+        paths = [directory]
+    else:
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            paths += [os.path.join(root, n) for n in sorted(files) if _is_log_file(n)]
+            if not recursive:
+                break
+    results = []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path in paths:
+            name = os.path.relpath(path, directory) if os.path.isdir(directory) else os.path.basename(path)
+            try:
+                result = bulk_import_file(path, executor, workers, name, on_progress)
+            except Exception as e:
+                result = {"file": name, "error": str(e)}
+            results.append(result)
+            if on_file:
+                on_file(result)
+    return results
+
+
+def _is_log_file(name: str) -> bool:
+    name = name[:-3] if name.endswith(".gz") else name
+    return bool(BULK_LOG_RE.search(name))
+
+
+def _is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def fts_query(query: str) -> str:
+    return " ".join(f'"{t}"*' for t in re.findall(r"\w+", query))
 
 
 def search_logs(query="", severity="", log_type="", src_ip="", dst_ip="",
-                protocol="", service="", page=1, page_size=50) -> dict:
-    conn = get_conn()
+                protocol="", service="", page=1, page_size=50,
+                cursor=None, total="approx", since=None, until=None) -> dict:
+    source = "logs"
+    columns = "logs.*"
+    keys = ("logs.created_at", "logs.id")
+    descending = True
     conditions = ["1=1"]
     params = []
-    if query:
-        conditions.append("(message LIKE ? OR host_name LIKE ? OR program LIKE ?)")
+    match = fts_query(query) if query and FTS_AVAILABLE else ""
+    if match:
+        source = "logs JOIN logs_fts ON logs_fts.rowid = logs.id"
+        columns = "logs.*, logs_fts.rank AS rank"
+        keys = ("logs_fts.rank", "logs.id")
+        descending = False
+        conditions.append("logs_fts MATCH ?")
+        params.append(match)
+    elif query:
+        conditions.append("(logs.message LIKE ? OR logs.host_name LIKE ? OR logs.program LIKE ?)")
         params += [f"%{query}%", f"%{query}%", f"%{query}%"]
     if severity:
         conditions.append("severity=?")
@@ -174,34 +446,41 @@ def search_logs(query="", severity="", log_type="", src_ip="", dst_ip="",
     if log_type:
         conditions.append("log_type=?")
         params.append(log_type)
-    if src_ip:
-        conditions.append("src_ip LIKE ?")
-        params.append(f"%{src_ip}%")
-    if dst_ip:
-        conditions.append("dst_ip LIKE ?")
-        params.append(f"%{dst_ip}%")
+    for column, value in (("src_ip", src_ip), ("dst_ip", dst_ip)):
+        if value and _is_ip(value):
+            conditions.append(f"{column}=?")
+            params.append(value)
+        elif value:
+            conditions.append(f"{column} LIKE ?")
+            params.append(f"%{value}%")
     if protocol:
         conditions.append("protocol=?")
         params.append(protocol)
     if service:
         conditions.append("service LIKE ?")
         params.append(f"%{service}%")
+    for op, value in ((">=", to_db_time(since)), ("<", to_db_time(until))):
+        if value:
+            conditions.append(f"logs.created_at {op} ?")
+            params.append(value)
     where = " AND ".join(conditions)
-    total = conn.execute(f"SELECT COUNT(*) FROM logs WHERE {where}", params).fetchone()[0]
-    offset = (page - 1) * page_size
-    rows = conn.execute(
-        f"SELECT * FROM logs WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
-        params + [page_size, offset]
-    ).fetchall()
-    conn.close()
-    return {"total": total, "logs": [dict(r) for r in rows]}
+    with connection() as conn:
+        count = count_rows(conn, source, where, params, total)
+        result = keyset_page(conn, f"SELECT {columns} FROM {source} WHERE {where}", params, keys,
+                             page_size, cursor, descending, (page - 1) * page_size)
+    for r in result["rows"]:
+        r.pop("rank", None)
+    return {"total": count, "logs": result["rows"], "next": result["next"], "prev": result["prev"]}
 
 
 def get_log_stats() -> dict:
-    conn = get_conn()
-    total = conn.execute("SELECT COUNT(*) FROM logs WHERE date(created_at)=date('now')").fetchone()[0]
-    by_sev = {r[0]: r[1] for r in conn.execute("SELECT severity, COUNT(*) FROM logs GROUP BY severity")}
-    by_type = {r[0]: r[1] for r in conn.execute("SELECT log_type, COUNT(*) FROM logs GROUP BY log_type")}
-    by_src = {r[0]: r[1] for r in conn.execute("SELECT log_source, COUNT(*) FROM logs GROUP BY log_source LIMIT 10")}
-    conn.close()
-    return {"total_today": total, "by_severity": by_sev, "by_type": by_type, "by_source": by_src}
+    with connection() as conn:
+        counters = read_counters(conn, "logs")
+    today = datetime.now(timezone.utc).date().isoformat()
+    by_src = sorted(counters.get("log_source", {}).items(), key=lambda kv: kv[1], reverse=True)[:10]
+    return {
+        "total_today": counters.get("day", {}).get(today, 0),
+        "by_severity": counters.get("severity", {}),
+        "by_type": counters.get("log_type", {}),
+        "by_source": dict(by_src),
+    }
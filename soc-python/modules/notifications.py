@@ -1,54 +1,165 @@
+import queue
+import threading
+import time
 import httpx
 from modules.config import load_config
+from modules.ratelimit import TokenBucket
 
 SEVERITY_ORDER = {"critical": 4, "high": 3, "medium": 2, "low": 1, "info": 0}
 
+TELEGRAM_API = "https://api.telegram.org"
+TWILIO_API = "https://api.twilio.com"
+
+DISPATCH_QUEUE_SIZE = 1000
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 1.0
+HTTP_TIMEOUT = 10
+
+_clients = {}
+_channels = {}
+_channels_lock = threading.Lock()
+
 
 def _severity_meets_threshold(severity: str, threshold: str) -> bool:
     return SEVERITY_ORDER.get(severity, 0) >= SEVERITY_ORDER.get(threshold, 0)
 
 
-def send_telegram(message: str) -> dict:
-    cfg = load_config()
+def _client(channel: str) -> httpx.Client:
+    client = _clients.get(channel)
+    if client is None:
+        with _channels_lock:
+            client = _clients.get(channel)
+            if client is None:
+                client = httpx.Client(
+                    timeout=HTTP_TIMEOUT,
+                    limits=httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=120),
+                )
+                _clients[channel] = client
+    return client
+
+
+def _post_telegram(message: str, cfg: dict) -> httpx.Response | None:
     token = cfg.get("telegram_token", "")
     chat_id = cfg.get("telegram_chat_id", "")
     if not token or not chat_id:
-        return {"error": "Telegram not configured"}
-    try:
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        resp = httpx.post(url, json={"chat_id": chat_id, "text": message, "parse_mode": "HTML"}, timeout=10)
-        return resp.json()
-    except Exception as e:
-        return {"error": str(e)}
+        return None
+    url = f"{TELEGRAM_API}/bot{token}/sendMessage"
+    return _client("telegram").post(url, json={"chat_id": chat_id, "text": message, "parse_mode": "HTML"})
 
 
-def send_whatsapp(message: str) -> dict:
-    cfg = load_config()
+def _post_whatsapp(message: str, cfg: dict) -> httpx.Response | None:
     sid = cfg.get("twilio_sid", "")
     token = cfg.get("twilio_token", "")
     from_n = cfg.get("twilio_from", "")
     to_n = cfg.get("twilio_to", "")
     if not all([sid, token, from_n, to_n]):
-        return {"error": "WhatsApp/Twilio not configured"}
+        return None
+    url = f"{TWILIO_API}/2010-04-01/Accounts/{sid}/Messages.json"
+    return _client("whatsapp").post(url, data={"From": from_n, "To": to_n, "Body": message}, auth=(sid, token))
+
+
+SENDERS = {"telegram": _post_telegram, "whatsapp": _post_whatsapp}
+
+
+def send_telegram(message: str) -> dict:
     try:
-        url = f"https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
-        resp = httpx.post(url, data={"From": from_n, "To": to_n, "Body": message},
-                          auth=(sid, token), timeout=10)
+        resp = _post_telegram(message, load_config())
+        if resp is None:
+            return {"error": "Telegram not configured"}
         return resp.json()
     except Exception as e:
         return {"error": str(e)}
 
 
+def send_whatsapp(message: str) -> dict:
+    try:
+        resp = _post_whatsapp(message, load_config())
+        if resp is None:
+            return {"error": "WhatsApp/Twilio not configured"}
+        return resp.json()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _channel(name: str) -> dict:
+    ch = _channels.get(name)
+    if ch and ch["thread"].is_alive():
+        return ch
+    with _channels_lock:
+        ch = _channels.get(name)
+        if ch and ch["thread"].is_alive():
+            return ch
+        cfg = load_config()
+        per_minute = float(cfg.get(f"{name}_rate_per_minute", 20))
+        ch = ch or {
+            "queue": queue.Queue(maxsize=DISPATCH_QUEUE_SIZE),
+            "bucket": TokenBucket(per_minute / 60, max(1.0, per_minute / 6)),
+            "stats": {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "dropped": 0,
+                      "last_latency_ms": 0.0, "last_error": None},
+        }
+        ch["thread"] = threading.Thread(target=_dispatch_loop, args=(name, ch), daemon=True)
+        ch["thread"].start()
+        _channels[name] = ch
+        return ch
+
+
+def _dispatch_loop(name: str, ch: dict):
+    stats = ch["stats"]
+    while True:
+        message = ch["queue"].get()
+        ch["bucket"].acquire()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            retryable = True
+            started = time.perf_counter()
+            try:
+                resp = SENDERS[name](message, load_config())
+                if resp is None:
+                    stats["last_error"] = "not configured"
+                    retryable = False
+                elif resp.status_code < 300:
+                    stats["sent"] += 1
+                    stats["last_latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                    break
+                else:
+                    stats["last_error"] = f"HTTP {resp.status_code}"
+                    retryable = resp.status_code == 429 or resp.status_code >= 500
+            except httpx.HTTPError as e:
+                stats["last_error"] = str(e) or type(e).__name__
+            except Exception as e:
+                # Bad config (e.g. an invalid URL) or a sender bug: give up on this message, keep the channel.
+                stats["last_error"] = f"{type(e).__name__}: {e}"
+                retryable = False
+            if not retryable or attempt == MAX_ATTEMPTS:
+                stats["failed"] += 1
+                break
+            stats["retries"] += 1
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+def _enqueue(name: str, message: str):
+    ch = _channel(name)
+    try:
+        ch["queue"].put_nowait(message)
+        ch["stats"]["queued"] += 1
+    except queue.Full:
+        ch["stats"]["dropped"] += 1
+
+
 def send_alert(title: str, severity: str, description: str):
     cfg = load_config()
     message = f"🚨 <b>SOC ALERT</b>\n<b>Severity:</b> {severity.upper()}\n<b>Title:</b> {title}\n<b>Details:</b> {description}"
 
     if cfg.get("telegram_token") and _severity_meets_threshold(severity, cfg.get("telegram_min_severity", "high")):
-        send_telegram(message)
+        _enqueue("telegram", message)
 
     plain = f"SOC ALERT | {severity.upper()} | {title} | {description}"
     if cfg.get("twilio_sid") and _severity_meets_threshold(severity, cfg.get("whatsapp_min_severity", "high")):
-        send_whatsapp(plain)
+        _enqueue("whatsapp", plain)
+
+
+def dispatcher_status() -> dict:
+    return {name: {**ch["stats"], "queue_depth": ch["queue"].qsize(), "running": ch["thread"].is_alive()}
+            for name, ch in list(_channels.items())}
 
 
 def test_telegram() -> dict:
@@ -0,0 +1,210 @@
+import os
+import mmap
+import struct
+import threading
+import time
+from collections import Counter
+from modules import ids
+from modules.decode import decode_frame
+from modules.detection import ThresholdTracker
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_SHB = b"\x0a\x0d\x0d\x0a"
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+PCAP_EXT = {".pcap", ".pcapng", ".cap"}
+
+_replay_status = {"running": False, "file": None, "progress": None, "last_result": None}
+_replay_cancel = threading.Event()
+
+
+def iter_pcap(path: str, progress: dict = None):
+    """Yield (timestamp, frame, linktype, wire_length) from a pcap or pcapng file."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 4:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if progress is not None:
+                progress["total_bytes"] = len(mm)
+            if mm[:4] == PCAPNG_SHB:
+                yield from _iter_pcapng(mm, progress)
+            elif mm[:4] in PCAP_MAGIC:
+                yield from _iter_pcap(mm, progress)
+            else:
+                raise ValueError("not a pcap or pcapng file")
+
+
+def _iter_pcap(mm, progress: dict = None):
+    endian, resolution = PCAP_MAGIC[mm[:4]]
+    linktype = struct.unpack_from(endian + "I", mm, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + "IIII")
+    pos, size = 24, len(mm)
+    while pos + 16 <= size:
+        sec, frac, caplen, origlen = record.unpack_from(mm, pos)
+        pos += 16
+        if pos + caplen > size:
+            break
+        yield sec + frac * resolution, mm[pos:pos + caplen], linktype, origlen
+        pos += caplen
+        if progress is not None:
+            progress["bytes"] = pos
+
+
+def _if_tsresol(mm, pos: int, end: int, endian: str) -> float:
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(endian + "HH", mm, pos)
+        if code == 0:
+            break
+        if code == 9 and length == 1:
+            value = mm[pos + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        pos += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+def _interface(interfaces: list, iface: int, pos: int) -> tuple:
+    if iface >= len(interfaces):
+        raise ValueError(f"packet block at offset {pos} references undefined interface {iface}")
+    return interfaces[iface]
+
+
+def _iter_pcapng(mm, progress: dict = None):
+    endian = "<"
+    interfaces = []
+    pos, size = 0, len(mm)
+    while pos + 12 <= size:
+        if mm[pos:pos + 4] == PCAPNG_SHB:
+            endian = "<" if struct.unpack_from("<I", mm, pos + 8)[0] == PCAPNG_BYTE_ORDER else ">"
+            interfaces = []
+        block_type, block_len = struct.unpack_from(endian + "II", mm, pos)
+        if block_len < 12 or pos + block_len > size:
+            break
+        body, end = pos + 8, pos + block_len - 4
+        if block_type == 1:
+            linktype, _, snaplen = struct.unpack_from(endian + "HHI", mm, body)
+            interfaces.append((linktype, snaplen, _if_tsresol(mm, body + 8, end, endian)))
+        elif block_type == 6 and interfaces:
+            iface, high, low, caplen, origlen = struct.unpack_from(endian + "IIIII", mm, body)
+            linktype, _, resolution = _interface(interfaces, iface, pos)
+            data = body + 20
+            yield ((high << 32) | low) * resolution, mm[data:data + caplen], linktype, origlen
+        elif block_type == 3 and interfaces:
+            origlen = struct.unpack_from(endian + "I", mm, body)[0]
+            linktype, snaplen, _ = interfaces[0]
+            caplen = min(origlen, end - body - 4, snaplen or origlen)
+            yield None, mm[body + 4:body + 4 + caplen], linktype, origlen
+        elif block_type == 2 and interfaces:
+            iface, _, high, low, caplen, origlen = struct.unpack_from(endian + "HHIIII", mm, body)
+            linktype, _, resolution = _interface(interfaces, iface, pos)
+            data = body + 20
+            yield ((high << 32) | low) * resolution, mm[data:data + caplen], linktype, origlen
+        pos += block_len
+        if progress is not None:
+            progress["bytes"] = pos
+
+
+def replay_pcap(path: str, realtime: bool = False, speed: float = 1.0,
+                store_packets: bool = True, progress: dict = None) -> dict:
+    if not os.path.isfile(path):
+        return {"error": f"file not found: {path}"}
+    ids._dedup_window()
+    tracker = ThresholdTracker()
+    progress = progress if progress is not None else {}
+    stages = dict.fromkeys(("read", "decode", "detect", "alert", "store", "drain"), 0.0)
+    alerts = Counter()
+    packets = decoded = wire_bytes = 0
+    base = None
+    perf = time.perf_counter
+    started = perf()
+    try:
+        records = iter_pcap(path, progress)
+        while not _replay_cancel.is_set():
+            t0 = perf()
+            try:
+                ts, frame, linktype, origlen = next(records)
+            except StopIteration:
+                break
+            t1 = perf()
+            stages["read"] += t1 - t0
+            packets += 1
+            wire_bytes += origlen
+            if realtime and ts is not None:
+                if base is None:
+                    base = (ts, time.monotonic())
+                delay = base[1] + (ts - base[0]) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                t1 = perf()
+            pkt_info = decode_frame(frame, linktype, ts, origlen)
+            t2 = perf()
+            stages["decode"] += t2 - t1
+            if not pkt_info:
+                continue
+            decoded += 1
+            now = ts or time.time()
+            triggered = ids._evaluate(pkt_info, now, tracker)
+            t3 = perf()
+            stages["detect"] += t3 - t2
+            for rule in triggered:
+                ids._save_alert(pkt_info, rule, now)
+                alerts[rule["id"]] += 1
+            t4 = perf()
+            stages["alert"] += t4 - t3
+            if store_packets:
+                ids._store_packet(pkt_info, triggered, now, block=True)
+                stages["store"] += perf() - t4
+            progress["packets"] = packets
+    except (OSError, ValueError, struct.error) as e:
+        return {"error": str(e), "packets": packets}
+    t5 = perf()
+    drained = ids.drain_writer()
+    stages["drain"] = perf() - t5
+    elapsed = perf() - started
+    return {
+        "file": os.path.basename(path),
+        "packets": packets,
+        "decoded": decoded,
+        "bytes": wire_bytes,
+        "alerts": sum(alerts.values()),
+        "alerts_by_rule": dict(alerts.most_common()),
+        "cancelled": _replay_cancel.is_set(),
+        "drained": drained,
+        "seconds": round(elapsed, 3),
+        "pps": round(packets / elapsed) if elapsed else packets,
+        "mbps": round(wire_bytes * 8 / elapsed / 1e6, 2) if elapsed else 0,
+        "stages": {k: round(v, 3) for k, v in stages.items()},
+        "writer": dict(ids._writer_stats),
+    }
+
+
+def replay_async(path: str, realtime: bool = False, speed: float = 1.0, store_packets: bool = True) -> dict:
+    if _replay_status["running"]:
+        return {"error": "replay already running"}
+    _replay_cancel.clear()
+    progress = {"packets": 0, "bytes": 0, "total_bytes": None}
+    _replay_status.update(running=True, file=os.path.basename(path), progress=progress)
+
+    def _run():
+        try:
+            _replay_status["last_result"] = replay_pcap(path, realtime, speed, store_packets, progress)
+        finally:
+            _replay_status["running"] = False
+
+    threading.Thread(target=_run, daemon=True).start()
+    return {"status": "replay started", "file": os.path.basename(path)}
+
+
+def stop_replay() -> dict:
+    _replay_cancel.set()
+    return {"status": "stopping" if _replay_status["running"] else "idle"}
+
+
+def get_replay_status() -> dict:
+    status = _replay_status.copy()
+    if status["progress"]:
+        status["progress"] = dict(status["progress"])
+    return status
@@ -0,0 +1,153 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from modules.decode import decode_frame, flow_tuple
+from modules.detection import ThresholdTracker
+
+DISPATCH_BATCH = 256
+DISPATCH_FLUSH = 0.05
+QUEUE_BATCHES = 256
+JOIN_TIMEOUT = 10
+
+
+def shard_fields(rules: list[dict]) -> str:
+    """Pick the coarsest hash key that keeps every threshold's state on one worker."""
+    tracks = {r["threshold"].get("track", "src") for r in rules if r.get("threshold")}
+    if "src" in tracks:
+        return "src"
+    if "dst" in tracks:
+        return "dst"
+    if "src_dst" in tracks:
+        return "src_dst"
+    return "flow"
+
+
+def _shard_key(key: tuple, mode: str):
+    src, dst, proto, sport, dport = key
+    if mode == "src":
+        return src
+    if mode == "dst":
+        return dst
+    if mode == "src_dst":
+        return src, dst
+    a, b = (src, sport), (dst, dport)
+    return (a, b, proto) if a <= b else (b, a, proto)
+
+
+def _worker_main(index: int, inbox, outbox, rules: list[dict]):
+    from modules import ids
+    ids.load_rules(rules)
+    tracker = ThresholdTracker()
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        out = []
+        for data, linktype, ts in batch:
+            try:
+                pkt_info = decode_frame(data, linktype, ts)
+                if pkt_info:
+                    triggered = ids._evaluate(pkt_info, ts or time.time(), tracker)
+                    out.append((pkt_info, [r["id"] for r in triggered]))
+            except Exception:
+                pass
+        outbox.put((index, out, len(batch)))
+    outbox.put((index, None, 0))
+
+
+class ShardedPipeline:
+    """Capture thread -> N detection processes (sharded by flow hash) -> one result sink."""
+
+    def __init__(self, workers: int, rules: list[dict], sink):
+        ctx = mp.get_context("spawn")
+        self.workers = workers
+        self.mode = shard_fields(rules)
+        self.rules = {r["id"]: r for r in rules}
+        self.sink = sink
+        self.inputs = [ctx.Queue(QUEUE_BATCHES) for _ in range(workers)]
+        self.results = ctx.Queue(QUEUE_BATCHES * workers)
+        self.procs = [ctx.Process(target=_worker_main, args=(i, q, self.results, rules), daemon=True)
+                      for i, q in enumerate(self.inputs)]
+        self.pending = [[] for _ in range(workers)]
+        self.stats = {"dispatched": [0] * workers, "processed": [0] * workers,
+                      "dropped": 0, "undecodable": 0, "merged": 0}
+        self._last_flush = time.monotonic()
+        self._merger = threading.Thread(target=self._merge, daemon=True)
+
+    def start(self):
+        for p in self.procs:
+            p.start()
+        self._merger.start()
+
+    def submit(self, data: bytes, linktype: int, ts: float):
+        key = flow_tuple(data, linktype)
+        if key is None:
+            self.stats["undecodable"] += 1
+            return
+        shard = hash(_shard_key(key, self.mode)) % self.workers
+        batch = self.pending[shard]
+        batch.append((data, linktype, ts))
+        if len(batch) >= DISPATCH_BATCH:
+            self._send(shard)
+        if time.monotonic() - self._last_flush >= DISPATCH_FLUSH:
+            self.flush()
+
+    def flush(self):
+        for shard, batch in enumerate(self.pending):
+            if batch:
+                self._send(shard)
+        self._last_flush = time.monotonic()
+
+    def _send(self, shard: int):
+        batch, self.pending[shard] = self.pending[shard], []
+        try:
+            self.inputs[shard].put_nowait(batch)
+            self.stats["dispatched"][shard] += len(batch)
+        except queue.Full:
+            self.stats["dropped"] += len(batch)
+
+    def _merge(self):
+        live = self.workers
+        while live:
+            index, out, processed = self.results.get()
+            if out is None:
+                live -= 1
+                continue
+            self.stats["processed"][index] += processed
+            for pkt_info, rule_ids in out:
+                try:
+                    self.sink(pkt_info, [self.rules[rid] for rid in rule_ids])
+                except Exception:
+                    pass
+            self.stats["merged"] += len(out)
+
+    def close(self):
+        self.flush()
+        for q in self.inputs:
+            q.put(None)
+        self._merger.join(JOIN_TIMEOUT)
+        for p in self.procs:
+            p.join(JOIN_TIMEOUT)
+            if p.is_alive():
+                p.terminate()
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "shard_by": self.mode,
+            "queues": {
+                "dispatch_pending": sum(len(b) for b in self.pending),
+                "workers": [_qsize(q) for q in self.inputs],
+                "results": _qsize(self.results),
+            },
+            "alive": sum(p.is_alive() for p in self.procs),
+            **{k: (list(v) if isinstance(v, list) else v) for k, v in self.stats.items()},
+        }
+
+
+def _qsize(q) -> int | None:
+    try:
+        return q.qsize()
+    except NotImplementedError:
+        return None
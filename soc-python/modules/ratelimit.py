@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self.tokens) / self.rate) if self.rate else float("inf")
+
+    def acquire(self, tokens: float = 1):
+        while not self.try_acquire(tokens):
+            time.sleep(self.wait_time(tokens))
@@ -1,15 +1,23 @@
 import os
-from flask import Blueprint, request, jsonify, session, redirect, url_for
-from modules.auth import verify_password, generate_token, login_required, get_user
-from modules.database import get_conn
+import time
+from flask import Blueprint, Response, request, jsonify, session, redirect, url_for, stream_with_context
+from modules.auth import (verify_password_bounded, check_login_rate, login_pool_status,
+                          generate_token, generate_stream_ticket, login_required, get_user)
+from modules.database import pool_stats
+from modules.storage import storage_status, run_maintenance
 from modules.config import load_config, save_config
-from modules.log_analysis import process_upload, search_logs, get_log_stats
+from modules.log_analysis import process_upload, search_logs, get_log_stats, get_ingest_progress
 from modules.scanner import scan_async, get_status as scanner_status, scan_network
 from modules.ids import (get_alerts, update_alert_status, get_alert_stats,
-                          start_capture, stop_capture, capture_status, get_recent_packets)
+                          start_capture, stop_capture, capture_status, get_recent_packets, get_flows)
 from modules.assets import get_all_assets, get_asset, delete_asset, get_asset_stats
-from modules.notifications import send_telegram, send_whatsapp, test_telegram, test_whatsapp
+from modules.pcap import replay_async, stop_replay, get_replay_status, PCAP_EXT
+from modules.notifications import send_telegram, send_whatsapp, test_telegram, test_whatsapp, dispatcher_status
 from modules.config import UPLOAD_DIR
+from modules.control import services_route, services_json, ROLE
+from modules import events, cache
+from modules.stream import stream_status as stream_server_status
+from modules.cache import cached
 
 api = Blueprint("api", __name__, url_prefix="/api")
 ALLOWED_EXT = {".log", ".txt", ".json", ".csv"}
@@ -18,8 +26,19 @@ ALLOWED_EXT = {".log", ".txt", ".json", ".csv"}
 @api.route("/auth/login", methods=["POST"])
 def login():
     data = request.json or {}
-    user = get_user(data.get("username", ""))
-    if not user or not verify_password(data.get("password", ""), user["password_hash"]):
+    username = data.get("username", "")
+    wait = check_login_rate(username, request.remote_addr)
+    if wait:
+        resp = jsonify({"error": "Too many login attempts", "retry_after": round(wait, 1)})
+        resp.headers["Retry-After"] = str(int(wait) + 1)
+        return resp, 429
+    user = get_user(username)
+    ok = verify_password_bounded(data.get("password", ""), user["password_hash"]) if user else False
+    if ok is None:
+        resp = jsonify({"error": "Login service busy, try again"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    if not ok:
         return jsonify({"error": "Invalid credentials"}), 401
     token = generate_token(user["id"], user["username"], user["role"])
     session["token"] = token
@@ -38,7 +57,7 @@ def dashboard_stats():
     log_s = get_log_stats()
     alert_s = get_alert_stats()
     asset_s = get_asset_stats()
-    cap = capture_status()
+    cap = services_json("/api/capture/status", capture_status)
     return jsonify({
         "logs": log_s,
         "alerts": alert_s,
@@ -49,6 +68,7 @@ def dashboard_stats():
 
 @api.route("/logs/upload", methods=["POST"])
 @login_required
+@services_route
 def upload_log():
     if "file" not in request.files:
         return jsonify({"error": "No file provided"}), 400
@@ -63,8 +83,16 @@ def upload_log():
     return jsonify({"filename": f.filename, **result})
 
 
+@api.route("/logs/upload/progress")
+@login_required
+@services_route
+def upload_progress():
+    return jsonify(get_ingest_progress(request.args.get("filename")))
+
+
 @api.route("/logs/search")
 @login_required
+@cached("logs")
 def logs_search():
     r = request.args
     result = search_logs(
@@ -73,28 +101,34 @@ def logs_search():
         dst_ip=r.get("dst_ip", ""), protocol=r.get("protocol", ""),
         service=r.get("service", ""),
         page=int(r.get("page", 1)), page_size=int(r.get("page_size", 50)),
+        cursor=r.get("cursor"), total=r.get("total", "approx"),
+        since=r.get("since"), until=r.get("until"),
     )
     return jsonify(result)
 
 
 @api.route("/logs/stats")
 @login_required
+@cached("logs", key=lambda: time.strftime("%Y-%m-%d", time.gmtime()))
 def logs_stats():
     return jsonify(get_log_stats())
 
 
 @api.route("/alerts")
 @login_required
+@cached("alerts")
 def alerts():
     r = request.args
     return jsonify(get_alerts(
         status=r.get("status"), severity=r.get("severity"),
         page=int(r.get("page", 1)), page_size=int(r.get("page_size", 50)),
+        cursor=r.get("cursor"), total=r.get("total", "approx"),
     ))
 
 
 @api.route("/alerts/<int:alert_id>/status", methods=["PUT"])
 @login_required
+@services_route
 def alert_status(alert_id):
     data = request.json or {}
     update_alert_status(alert_id, data.get("status", "open"))
@@ -103,12 +137,14 @@ def alert_status(alert_id):
 
 @api.route("/alerts/stats")
 @login_required
+@cached("alerts")
 def alerts_stats():
     return jsonify(get_alert_stats())
 
 
 @api.route("/network/scan", methods=["POST"])
 @login_required
+@services_route
 def network_scan():
     data = request.json or {}
     target = data.get("target")
@@ -123,12 +159,14 @@ def network_scan():
 
 @api.route("/network/scan/status")
 @login_required
+@services_route
 def network_scan_status():
     return jsonify(scanner_status())
 
 
 @api.route("/capture/start", methods=["POST"])
 @login_required
+@services_route
 def capture_start():
     data = request.json or {}
     return jsonify(start_capture(interface=data.get("interface")))
@@ -136,34 +174,89 @@ def capture_start():
 
 @api.route("/capture/stop", methods=["POST"])
 @login_required
+@services_route
 def capture_stop():
     return jsonify(stop_capture())
 
 
 @api.route("/capture/status")
 @login_required
+@services_route
 def capture_status_route():
     return jsonify(capture_status())
 
 
+@api.route("/capture/replay", methods=["POST"])
+@login_required
+@services_route
+def capture_replay():
+    if "file" in request.files:
+        f = request.files["file"]
+        filename = os.path.basename(f.filename or "")
+        data = request.form
+    else:
+        data = request.json or {}
+        filename = os.path.basename(data.get("filename") or "")
+        f = None
+    if os.path.splitext(filename)[1].lower() not in PCAP_EXT:
+        return jsonify({"error": "A .pcap or .pcapng file is required"}), 400
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, filename)
+    if f:
+        f.save(path)
+    elif not os.path.isfile(path):
+        return jsonify({"error": f"{filename} not found in uploads"}), 404
+    realtime = str(data.get("realtime", "")).lower() in ("1", "true", "yes")
+    store = str(data.get("store_packets", "true")).lower() not in ("0", "false", "no")
+    return jsonify(replay_async(path, realtime=realtime, speed=float(data.get("speed") or 1.0),
+                                store_packets=store))
+
+
+@api.route("/capture/replay/status")
+@login_required
+@services_route
+def capture_replay_status():
+    return jsonify(get_replay_status())
+
+
+@api.route("/capture/replay/stop", methods=["POST"])
+@login_required
+@services_route
+def capture_replay_stop():
+    return jsonify(stop_replay())
+
+
 @api.route("/capture/packets")
 @login_required
 def packets():
     limit = int(request.args.get("limit", 100))
-    return jsonify(get_recent_packets(limit))
+    return jsonify(get_recent_packets(limit, request.args.get("cursor"),
+                                      request.args.get("since"), request.args.get("until")))
+
+
+@api.route("/capture/flows")
+@login_required
+def flows():
+    a = request.args
+    return jsonify(get_flows(a.get("src_ip"), a.get("dst_ip"), a.get("protocol"),
+                             int(a.get("limit", 100)), a.get("cursor")))
 
 
 @api.route("/assets")
 @login_required
+@cached("assets")
 def assets_list():
     r = request.args
     return jsonify(get_all_assets(
-        page=int(r.get("page", 1)), page_size=int(r.get("page_size", 50))
+        page=int(r.get("page", 1)), page_size=int(r.get("page_size", 50)),
+        cursor=r.get("cursor"), total=r.get("total", "approx"),
+        port=r.get("port", type=int), service=r.get("service"), os_name=r.get("os"),
     ))
 
 
 @api.route("/assets/<ip>")
 @login_required
+@cached("assets")
 def asset_detail(ip):
     a = get_asset(ip)
     if not a:
@@ -180,6 +273,7 @@ def asset_delete(ip):
 
 @api.route("/config", methods=["GET"])
 @login_required
+@cached("config")
 def config_get():
     cfg = load_config()
     safe = {k: v for k, v in cfg.items() if "token" not in k and "secret" not in k and "sid" not in k}
@@ -208,6 +302,119 @@ def notif_whatsapp():
     return jsonify(test_whatsapp())
 
 
+@api.route("/notifications/status")
+@login_required
+@services_route
+def notif_status():
+    return jsonify(dispatcher_status())
+
+
+@api.route("/database/pool")
+@login_required
+def database_pool():
+    return jsonify(pool_stats())
+
+
+@api.route("/auth/status")
+@login_required
+def auth_status():
+    return jsonify(login_pool_status())
+
+
+@api.route("/database/storage")
+@login_required
+@services_route
+def database_storage():
+    return jsonify(storage_status())
+
+
+@api.route("/database/retention", methods=["POST"])
+@login_required
+@services_route
+def database_retention():
+    return jsonify(run_maintenance())
+
+
+@api.route("/stream")
+@login_required
+def stream():
+    """Server-sent events: alert, packets, logs, assets (and resync when the client fell behind).
+
+    Fallback for when the dedicated stream server (/stream/ticket) is unavailable: each
+    connection holds a request thread, so few are allowed and each is closed after a while.
+    """
+    # The API workers' relay connections (role "service") are internal and not capped.
+    relay = request.current_user.get("role") == "service"
+    if not relay and not events.acquire_wsgi_slot():
+        resp = jsonify({"error": "Too many open streams, poll instead"})
+        resp.headers["Retry-After"] = "30"
+        return resp, 503
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    kinds = set(filter(None, request.args.get("types", "").split(",")))
+    sub = events.subscribe(int(last_id) if last_id and last_id.isdigit() else None)
+    closes_at = float("inf") if relay else time.monotonic() + events.WSGI_STREAM_SECONDS
+
+    def generate():
+        try:
+            yield f"retry: {events.RELAY_RETRY * 1000}\n\n"
+            while time.monotonic() < closes_at:
+                batch = sub.get()
+                if not batch:
+                    yield ": keepalive\n\n"
+                for event in batch:
+                    if not kinds or event[1] in kinds or event[1] == "resync":
+                        yield events.format_sse(event)
+        finally:
+            events.unsubscribe(sub)
+            if not relay:
+                events.release_wsgi_slot()
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _stream_server_url(port: int) -> str:
+    public = load_config().get("stream_public_url")
+    if public:
+        return public.rstrip("/")
+    host = request.host
+    if host.startswith("["):
+        host = host[:host.index("]") + 1]
+    else:
+        host = host.split(":")[0]
+    return f"{request.scheme}://{host}:{port}/stream"
+
+
+@api.route("/stream/ticket")
+@login_required
+def stream_ticket():
+    """Where the browser should open its EventSource; url is null when only /api/stream is available."""
+    server = services_json("/api/stream/status", lambda: {"server": stream_server_status()}) or {}
+    port = (server.get("server") or {}).get("port")
+    if not port:
+        return jsonify({"url": None})
+    return jsonify({"url": _stream_server_url(port), "ticket": generate_stream_ticket(request.current_user)})
+
+
+@api.route("/stream/status")
+@login_required
+@services_route
+def stream_status():
+    return jsonify({**events.stats(), "server": stream_server_status()})
+
+
+@api.route("/cache/status")
+@login_required
+def cache_status():
+    return jsonify(cache.stats())
+
+
 @api.route("/health")
 def health():
     return jsonify({"status": "ok"})
+
+
+@api.route("/health/detail")
+@login_required
+def health_detail():
+    return jsonify({"status": "ok", "role": ROLE, "pid": os.getpid()})
@@ -1,8 +1,12 @@
 import threading
 import json
+import time
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from modules.database import get_conn
+from modules.database import connection
 from modules.config import load_config
+from modules import events, cache
 
 try:
     import nmap
@@ -10,70 +14,184 @@ try:
 except ImportError:
     NMAP_AVAILABLE = False
 
+SCAN_PROFILES = {
+    "quick":    "-sn",
+    "standard": "-sV -O --top-ports 1000 -T4",
+    "full":     "-sV -O -p- -T4",
+    "vuln":     "-sV --script vuln -T4",
+}
+MIN_CHUNK_PREFIX = 28
+DEEP_CHUNK_HOSTS = 16
+MAX_PROBE_PORTS = 1000
+FAST_PROBE_PORTS = (21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 389, 443, 445, 465, 587, 636,
+                    993, 995, 1433, 1521, 2049, 3306, 3389, 5432, 5900, 5985, 6379, 8000, 8080,
+                    8443, 9200, 27017)
+
+ASSET_UPSERT = """
+    INSERT INTO assets (ip_address,hostname,os_info,open_ports,status,first_seen,last_seen,
+                        last_scanned,change_count)
+    VALUES (?,?,?,?,?,?,?,?,?)
+    ON CONFLICT (ip_address) DO UPDATE SET
+        hostname=excluded.hostname, os_info=excluded.os_info, open_ports=excluded.open_ports,
+        status=excluded.status, last_seen=excluded.last_seen, last_scanned=excluded.last_scanned,
+        change_count=change_count + excluded.change_count
+"""
+
+PORT_UPSERT = """
+    INSERT INTO asset_ports (asset_id, port, protocol, service, version, first_seen, last_seen)
+    VALUES (?,?,?,?,?,?,?)
+    ON CONFLICT (asset_id, port, protocol) DO UPDATE SET
+        service=excluded.service, version=excluded.version, last_seen=excluded.last_seen
+"""
+
+ASSET_RULES = {
+    "new_host":    {"id": "A001", "name": "New Host Discovered", "severity": "medium", "category": "asset"},
+    "port_change": {"id": "A002", "name": "Open Ports Changed",  "severity": "medium", "category": "asset"},
+}
+
 _scan_lock = threading.Lock()
-_scan_status = {"running": False, "last_run": None, "last_result": None}
+_scan_status = {"running": False, "last_run": None, "last_result": None, "progress": None}
+_scheduler_thread = None
+_scheduler_status = {"enabled": False, "next_run": None, "last_cycle": None}
 
 
 def get_status() -> dict:
-    return _scan_status.copy()
+    status = _scan_status.copy()
+    status["scheduler"] = dict(_scheduler_status)
+    progress = status["progress"]
+    if progress:
+        progress = dict(progress)
+        elapsed = (progress.pop("_finished") or time.monotonic()) - progress.pop("_started")
+        progress["elapsed_seconds"] = round(elapsed, 1)
+        done, total = progress["hosts_done"], progress["hosts_total"]
+        progress["eta_seconds"] = round(elapsed / done * (total - done), 1) if done and status["running"] else None
+        status["progress"] = progress
+    return status
 
 
-def scan_network(target: str = None, scan_type: str = "standard") -> dict:
-    cfg = load_config()
-    target = target or cfg.get("network_range", "192.168.1.0/24")
+def split_targets(target: str, chunk_prefix: int = 24, workers: int = 1) -> list[tuple[str, int]]:
+    """Split an nmap target spec into (chunk, host count) pieces that can be scanned independently."""
+    chunks = []
+    for token in target.replace(",", " ").split():
+        try:
+            net = ipaddress.ip_network(token, strict=False)
+        except ValueError:
+            chunks.append((token, 1))
+            continue
+        if net.version != 4:
+            chunks.append((str(net), net.num_addresses))
+            continue
+        prefix = max(net.prefixlen, chunk_prefix)
+        while prefix < MIN_CHUNK_PREFIX and 2 ** (prefix - net.prefixlen) < workers:
+            prefix += 1
+        if prefix == net.prefixlen:
+            chunks.append((str(net), net.num_addresses))
+        else:
+            chunks += [(str(sub), sub.num_addresses) for sub in net.subnets(new_prefix=prefix)]
+    return chunks
 
-    if not NMAP_AVAILABLE:
-        return {"error": "python-nmap not installed", "hosts": []}
 
-    profiles = {
-        "quick":    "-sn",
-        "standard": "-sV -O --top-ports 1000 -T4",
-        "full":     "-sV -O -p- -T4",
-        "vuln":     "-sV --script vuln -T4",
+def _parse_host(nm, host: str) -> dict:
+    info = nm[host]
+    open_ports = []
+    for proto in info.all_protocols():
+        for port in info[proto].keys():
+            pd = info[proto][port]
+            if pd["state"] == "open":
+                open_ports.append({
+                    "port": port, "protocol": proto,
+                    "service": pd.get("name", ""),
+                    "version": pd.get("version", ""),
+                })
+    os_info = ""
+    if "osmatch" in info and info["osmatch"]:
+        os_info = info["osmatch"][0].get("name", "")
+    return {
+        "ip": host,
+        "hostname": info.hostname() or "",
+        "status": info.state(),
+        "os": os_info,
+        "open_ports": open_ports,
     }
-    args = profiles.get(scan_type, profiles["standard"])
 
+
+def _scan_chunk(chunk: str, args: str) -> list[dict]:
+    nm = nmap.PortScanner()
+    nm.scan(hosts=chunk, arguments=args)
+    return [_parse_host(nm, host) for host in nm.all_hosts()]
+
+
+def _begin_scan(chunks: list[tuple[str, int]], phase: str) -> dict | None:
     with _scan_lock:
+        if _scan_status["running"]:
+            return None
         _scan_status["running"] = True
+        progress = {"_started": time.monotonic(), "_finished": None, "phase": phase, "errors": []}
+        _scan_status["progress"] = progress
+    _reset_progress(progress, chunks, phase)
+    return progress
 
-    try:
-        nm = nmap.PortScanner()
-        nm.scan(hosts=target, arguments=args)
-        hosts = []
-        for host in nm.all_hosts():
-            info = nm[host]
-            open_ports = []
-            for proto in info.all_protocols():
-                for port in info[proto].keys():
-                    pd = info[proto][port]
-                    if pd["state"] == "open":
-                        open_ports.append({
-                            "port": port, "protocol": proto,
-                            "service": pd.get("name", ""),
-                            "version": pd.get("version", ""),
-                        })
-            hostname = ""
-            if info.hostname():
-                hostname = info.hostname()
-            os_info = ""
-            if "osmatch" in info and info["osmatch"]:
-                os_info = info["osmatch"][0].get("name", "")
-            hosts.append({
-                "ip": host,
-                "hostname": hostname,
-                "status": info.state(),
-                "os": os_info,
-                "open_ports": open_ports,
-            })
-            _upsert_asset(host, hostname, os_info, open_ports, info.state())
-        result = {"target": target, "scan_type": scan_type, "hosts": hosts, "count": len(hosts)}
+
+def _reset_progress(progress: dict, chunks: list[tuple[str, int]], phase: str):
+    with _scan_lock:
+        progress.update(phase=phase, chunks_total=len(chunks), chunks_done=0,
+                        hosts_total=sum(n for _, n in chunks), hosts_done=0, hosts_up=0)
+
+
+def _end_scan(progress: dict, result: dict = None):
+    if result is not None:
         _scan_status["last_result"] = result
         _scan_status["last_run"] = datetime.now(timezone.utc).isoformat()
+    progress["_finished"] = time.monotonic()
+    _scan_status["running"] = False
+
+
+def _run_chunks(chunks: list[tuple[str, int]], args: str, workers: int, progress: dict, on_chunk=None) -> list[dict]:
+    hosts = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nmap") as pool:
+        futures = {pool.submit(_scan_chunk, chunk, args): (chunk, n) for chunk, n in chunks}
+        for future in as_completed(futures):
+            chunk, n = futures[future]
+            try:
+                found = future.result()
+                if on_chunk:
+                    on_chunk(found)
+                hosts += found
+            except Exception as e:
+                found = []
+                progress["errors"].append(f"{chunk}: {e}")
+            with _scan_lock:
+                progress["chunks_done"] += 1
+                progress["hosts_done"] += n
+                progress["hosts_up"] += len(found)
+    return hosts
+
+
+def scan_network(target: str = None, scan_type: str = "standard") -> dict:
+    cfg = load_config()
+    target = target or cfg.get("network_range", "192.168.1.0/24")
+
+    if not NMAP_AVAILABLE:
+        return {"error": "python-nmap not installed", "hosts": []}
+
+    args = SCAN_PROFILES.get(scan_type, SCAN_PROFILES["standard"])
+    workers = max(1, int(cfg.get("scan_workers", 4)))
+    chunks = split_targets(target, int(cfg.get("scan_chunk_prefix", 24)), workers)
+    progress = _begin_scan(chunks, scan_type)
+    if progress is None:
+        return {"error": "scan already running", "hosts": []}
+
+    result = None
+    try:
+        hosts = _run_chunks(chunks, args, workers, progress,
+                            lambda found: _apply_results(found, cfg, deep=scan_type != "quick"))
+        result = {"target": target, "scan_type": scan_type, "hosts": hosts, "count": len(hosts),
+                  "chunks": len(chunks), "errors": progress["errors"]}
         return result
     except Exception as e:
         return {"error": str(e), "hosts": []}
     finally:
-        _scan_status["running"] = False
+        _end_scan(progress, result)
 
 
 def scan_async(target: str = None, scan_type: str = "standard"):
@@ -81,20 +199,209 @@ def scan_async(target: str = None, scan_type: str = "standard"):
     t.start()
 
 
-def _upsert_asset(ip, hostname, os_info, open_ports, status):
-    conn = get_conn()
-    now = datetime.now(timezone.utc).isoformat()
-    ports_json = json.dumps(open_ports)
-    existing = conn.execute("SELECT id FROM assets WHERE ip_address=?", (ip,)).fetchone()
-    if existing:
-        conn.execute("""
-            UPDATE assets SET hostname=?, os_info=?, open_ports=?, status=?, last_seen=?
-            WHERE ip_address=?
-        """, (hostname, os_info, ports_json, status, now, ip))
+def _port_set(open_ports) -> set[tuple]:
+    if isinstance(open_ports, str):
+        try:
+            open_ports = json.loads(open_ports or "[]")
+        except ValueError:
+            open_ports = []
+    return {(int(p["port"]), p.get("protocol", "tcp")) for p in open_ports or []}
+
+
+def _load_assets(conn, ips=None) -> dict[str, dict]:
+    sql = "SELECT ip_address, hostname, os_info, open_ports, status, last_scanned, change_count FROM assets"
+    if ips is None:
+        rows = conn.execute(sql).fetchall()
     else:
-        conn.execute("""
-            INSERT INTO assets (ip_address,hostname,os_info,open_ports,status,first_seen,last_seen)
-            VALUES (?,?,?,?,?,?,?)
-        """, (ip, hostname, os_info, ports_json, status, now, now))
-    conn.commit()
-    conn.close()
+        rows = []
+        ips = list(ips)
+        for i in range(0, len(ips), 500):
+            part = ips[i:i + 500]
+            rows += conn.execute(f"{sql} WHERE ip_address IN ({','.join('?' * len(part))})", part).fetchall()
+    return {r["ip_address"]: dict(r) for r in rows}
+
+
+def _asset_alert(kind: str, ip: str, description: str):
+    from modules.ids import _save_alert
+    _save_alert({"timestamp": datetime.now(timezone.utc).isoformat(), "src_ip": ip, "dst_ip": None,
+                 "src_port": None, "dst_port": None, "protocol": None, "description": description},
+                ASSET_RULES[kind])
+
+
+def _apply_results(hosts: list[dict], cfg: dict, deep: bool = True, probed: set = None,
+                   alert: bool = True) -> list[str]:
+    """Upsert scan results, diffing ports against the stored assets.
+
+    Returns the IPs whose open ports differ. With probed set, only those
+    ports are compared (fast probes see a subset of the port space).
+    """
+    if not hosts:
+        return []
+    now = datetime.now(timezone.utc).isoformat()
+    with connection() as conn:
+        stored = _load_assets(conn, (h["ip"] for h in hosts))
+    rows, changed, alerts = [], [], []
+    for h in hosts:
+        old = stored.get(h["ip"])
+        ports = _port_set(h["open_ports"])
+        if old is None:
+            if cfg.get("alert_on_new_host"):
+                alerts.append(("new_host", h["ip"], f"New host {h['ip']} ({h['hostname'] or 'unknown'}) "
+                               f"with {len(ports)} open ports"))
+        else:
+            before = _port_set(old["open_ports"])
+            if probed is not None:
+                before = {p for p in before if p[0] in probed}
+            if deep or probed is not None:
+                opened, closed = ports - before, before - ports
+                if opened or closed:
+                    changed.append(h["ip"])
+                    if cfg.get("alert_on_port_change"):
+                        alerts.append(("port_change", h["ip"], f"Ports changed on {h['ip']}: "
+                                       f"opened {sorted(p for p, _ in opened)}, closed {sorted(p for p, _ in closed)}"))
+        if deep:
+            rows.append((h["ip"], h["hostname"], h["os"], json.dumps(h["open_ports"]), h["status"], now, now,
+                         now, int(h["ip"] in changed)))
+        elif old is None:
+            rows.append((h["ip"], h["hostname"], "", "[]", h["status"], now, now, None, 0))
+    with connection() as conn:
+        if rows:
+            conn.executemany(ASSET_UPSERT, rows)
+        if deep:
+            _sync_ports(conn, hosts, now)
+        if not deep:
+            conn.executemany("UPDATE assets SET status=?, last_seen=? WHERE ip_address=?",
+                             [(h["status"], now, h["ip"]) for h in hosts if h["ip"] in stored])
+    cache.bump("assets")
+    events.publish("assets", {"upserted": len(rows), "new": [h["ip"] for h in hosts if h["ip"] not in stored],
+                              "changed": changed})
+    for kind, ip, description in alerts if alert else []:
+        try:
+            _asset_alert(kind, ip, description)
+        except Exception:
+            pass
+    return changed
+
+
+def _sync_ports(conn, hosts: list[dict], now: str):
+    ips = [h["ip"] for h in hosts]
+    ids = {}
+    for i in range(0, len(ips), 500):
+        part = ips[i:i + 500]
+        ids.update(conn.execute(f"SELECT ip_address, id FROM assets WHERE ip_address IN ({','.join('?' * len(part))})",
+                                part).fetchall())
+    conn.executemany(PORT_UPSERT, [
+        (ids[h["ip"]], int(p["port"]), p.get("protocol", "tcp"), p.get("service", ""), p.get("version", ""), now, now)
+        for h in hosts if h["ip"] in ids for p in h["open_ports"]
+    ])
+    conn.executemany("DELETE FROM asset_ports WHERE asset_id=? AND last_seen < ?",
+                     [(ids[ip], now) for ip in ips if ip in ids])
+
+
+def _in_target(ip: str, networks: list) -> bool:
+    addr = ipaddress.ip_address(ip)
+    return any(addr in net for net in networks)
+
+
+def _staleness(asset: dict, now: datetime) -> float:
+    try:
+        age = (now - datetime.fromisoformat(asset["last_scanned"])).total_seconds() / 3600
+    except (TypeError, ValueError):
+        return float("inf")
+    return age * (1 + (asset.get("change_count") or 0))
+
+
+def run_incremental_scan(target: str = None) -> dict:
+    """Discovery sweep, cheap port probe of known hosts, then -sV only where needed."""
+    cfg = load_config()
+    target = target or cfg.get("network_range", "192.168.1.0/24")
+    if not NMAP_AVAILABLE:
+        return {"error": "python-nmap not installed"}
+    workers = max(1, int(cfg.get("scan_workers", 4)))
+    chunks = split_targets(target, int(cfg.get("scan_chunk_prefix", 24)), workers)
+    progress = _begin_scan(chunks, "sweep")
+    if progress is None:
+        return {"error": "scan already running"}
+
+    result = None
+    try:
+        up = {h["ip"]: h for h in _run_chunks(chunks, SCAN_PROFILES["quick"], workers, progress)}
+        with connection() as conn:
+            stored = _load_assets(conn)
+        new = [ip for ip in up if ip not in stored]
+        known = [ip for ip in up if ip in stored]
+        _apply_results([up[ip] for ip in known], cfg, deep=False)
+
+        networks = []
+        for token in target.replace(",", " ").split():
+            try:
+                networks.append(ipaddress.ip_network(token, strict=False))
+            except ValueError:
+                pass
+        gone = [ip for ip, a in stored.items()
+                if a["status"] == "up" and ip not in up and networks and _in_target(ip, networks)]
+        if gone:
+            with connection() as conn:
+                conn.executemany("UPDATE assets SET status='down' WHERE ip_address=?", [(ip,) for ip in gone])
+            cache.bump("assets")
+
+        ports = sorted(set(FAST_PROBE_PORTS) | {p for ip in known for p, _ in _port_set(stored[ip]["open_ports"])})
+        ports = ports[:MAX_PROBE_PORTS]
+        changed = []
+        if known:
+            probe_chunks = [(" ".join(known[i:i + DEEP_CHUNK_HOSTS]), len(known[i:i + DEEP_CHUNK_HOSTS]))
+                            for i in range(0, len(known), DEEP_CHUNK_HOSTS)]
+            _reset_progress(progress, probe_chunks, "probe")
+            probe_args = f"-T4 -Pn -p {','.join(map(str, ports))}"
+            probe = _run_chunks(probe_chunks, probe_args, workers, progress)
+            for h in probe:
+                h["hostname"] = h["hostname"] or up.get(h["ip"], {}).get("hostname", "")
+            changed = _apply_results(probe, cfg, deep=False, probed=set(ports), alert=False)
+
+        now = datetime.now(timezone.utc)
+        budget = max(0, int(cfg.get("scan_deep_budget", 16)))
+        fresh = set(new) | set(changed)
+        stale = sorted((ip for ip in known if ip not in fresh),
+                       key=lambda ip: _staleness(stored[ip], now), reverse=True)[:max(0, budget - len(fresh))]
+        deep = list(new) + list(changed) + stale
+        if deep:
+            deep_chunks = [(" ".join(deep[i:i + DEEP_CHUNK_HOSTS]), len(deep[i:i + DEEP_CHUNK_HOSTS]))
+                           for i in range(0, len(deep), DEEP_CHUNK_HOSTS)]
+            _reset_progress(progress, deep_chunks, "deep")
+            # The deep pass diffs ports, so a ping-sweep profile would read as "all ports closed".
+            deep_type = cfg.get("scan_type", "standard")
+            if deep_type not in SCAN_PROFILES or deep_type == "quick":
+                deep_type = "standard"
+            _run_chunks(deep_chunks, SCAN_PROFILES[deep_type], workers, progress,
+                        lambda found: _apply_results(found, cfg, deep=True))
+        result = {"target": target, "scan_type": "incremental", "up": len(up), "new": new,
+                  "changed": changed, "down": gone, "deep_scanned": len(deep), "stale_refreshed": len(stale),
+                  "count": len(up), "errors": progress["errors"]}
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        _end_scan(progress, result)
+
+
+def start_scheduler():
+    global _scheduler_thread
+    if _scheduler_thread and _scheduler_thread.is_alive():
+        return
+
+    def _loop():
+        next_run = time.time()
+        while True:
+            cfg = load_config()
+            _scheduler_status["enabled"] = bool(cfg.get("auto_scan_enabled"))
+            interval = max(1, int(cfg.get("scan_interval_minutes", 15))) * 60
+            next_run = min(next_run, time.time() + interval)
+            _scheduler_status["next_run"] = (datetime.fromtimestamp(next_run, timezone.utc).isoformat()
+                                             if _scheduler_status["enabled"] else None)
+            if _scheduler_status["enabled"] and time.time() >= next_run and not _scan_status["running"]:
+                _scheduler_status["last_cycle"] = run_incremental_scan()
+                next_run = time.time() + interval
+            time.sleep(30)
+
+    _scheduler_thread = threading.Thread(target=_loop, daemon=True)
+    _scheduler_thread.start()
@@ -0,0 +1,252 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from modules import database, cache
+from modules.database import connection, decode_cursor, encode_cursor, to_db_time, PRAGMAS, POOL_TIMEOUT
+from modules.config import load_config
+
+DELETE_BATCH = 5000
+PARTITION_RE = re.compile(r"^packets_(\d{8})\.db$")
+
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    src_ip TEXT,
+    dst_ip TEXT,
+    src_port INTEGER,
+    dst_port INTEGER,
+    protocol TEXT,
+    length INTEGER,
+    flags TEXT,
+    payload_preview TEXT,
+    alert_triggered INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_packets_created ON packets (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_packets_src_ip ON packets (src_ip);
+CREATE INDEX IF NOT EXISTS idx_packets_dst_ip ON packets (dst_ip);
+"""
+
+PARTITION_INSERT = """
+    INSERT INTO packets (timestamp,src_ip,dst_ip,src_port,dst_port,protocol,
+                         length,flags,payload_preview,alert_triggered,created_at)
+    VALUES (:timestamp,:src_ip,:dst_ip,:src_port,:dst_port,:protocol,
+            :length,:flags,:payload_preview,:alert_triggered,:created_at)
+"""
+
+# table -> (config key in days, extra WHERE limiting which rows may be removed)
+RETENTION = {
+    "logs":   ("retention_logs_days", ""),
+    "alerts": ("retention_alerts_days", " AND status != 'open'"),
+    "flows":  ("retention_flows_days", ""),
+}
+
+_writer_conns = {}
+_maintenance_thread = None
+_maintenance_status = {"running": False, "last_run": None, "last_result": None}
+
+
+def partition_dir() -> str:
+    return os.path.join(database.DATA_DIR, "partitions")
+
+
+def partition_path(day: str) -> str:
+    return os.path.join(partition_dir(), f"packets_{day.replace('-', '')}.db")
+
+
+def list_partitions() -> list[str]:
+    """Days with a packet partition on disk, oldest first, as YYYY-MM-DD."""
+    try:
+        names = os.listdir(partition_dir())
+    except FileNotFoundError:
+        return []
+    days = []
+    for name in names:
+        m = PARTITION_RE.match(name)
+        if m:
+            d = m.group(1)
+            days.append(f"{d[:4]}-{d[4:6]}-{d[6:]}")
+    return sorted(days)
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _writer_conn(day: str) -> sqlite3.Connection:
+    conn = _writer_conns.get(day)
+    if conn is None:
+        for old in list(_writer_conns):
+            _writer_conns.pop(old).close()
+        os.makedirs(partition_dir(), exist_ok=True)
+        conn = sqlite3.connect(partition_path(day), timeout=POOL_TIMEOUT)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.executescript(PARTITION_SCHEMA)
+        _writer_conns[day] = conn
+    return conn
+
+
+def write_packets(rows: list[dict]):
+    """Append a batch to today's partition. Only called from the packet writer thread."""
+    created = _utc_now()
+    for row in rows:
+        row["created_at"] = created
+    conn = _writer_conn(created[:10])
+    with conn:
+        conn.executemany(PARTITION_INSERT, rows)
+
+
+@contextmanager
+def attached(conn, day: str):
+    conn.execute("ATTACH DATABASE ? AS part", (partition_path(day),))
+    try:
+        yield "part"
+    finally:
+        conn.execute("DETACH DATABASE part")
+
+
+def page_packets(where: str, params: list, limit: int, cursor: str = None,
+                 since: str = None, until: str = None) -> dict:
+    """Keyset page over (created_at, id) across the day partitions, newest first.
+
+    Only partitions between since/until (and on the cursor's side of the page
+    boundary) are attached. The legacy main-DB packets table is read last.
+    """
+    direction, values = (decode_cursor(cursor) if cursor else None) or ("n", None)
+    if values is not None and (len(values) != 2 or not isinstance(values[0], str)):
+        direction, values = "n", None
+    backwards = direction == "p"
+    since, until = to_db_time(since), to_db_time(until)
+    days = [d for d in list_partitions()
+            if (not since or d >= since[:10]) and (not until or d <= until[:10])]
+    if values is not None:
+        days = [d for d in days if (d >= values[0][:10] if backwards else d <= values[0][:10])]
+    sources = ["main"] + days if backwards else days[::-1] + ["main"]
+
+    sql = f"WHERE {where}"
+    params = list(params)
+    if since:
+        sql += " AND created_at >= ?"
+        params.append(since)
+    if until:
+        sql += " AND created_at < ?"
+        params.append(until)
+    if values is not None:
+        sql += f" AND (created_at, id) {'>' if backwards else '<'} (?, ?)"
+        params += list(values)
+    order = "ASC" if backwards else "DESC"
+
+    rows = []
+    with connection() as conn:
+        for source in sources:
+            query = f"SELECT * FROM {{}}.packets {sql} ORDER BY created_at {order}, id {order} LIMIT ?"
+            args = params + [limit + 1 - len(rows)]
+            if source == "main":
+                rows += [dict(r) for r in conn.execute(query.format("main"), args)]
+            else:
+                with attached(conn, source) as schema:
+                    rows += [dict(r) for r in conn.execute(query.format(schema), args)]
+            if len(rows) > limit:
+                break
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    has_next = more if not backwards else values is not None
+    has_prev = values is not None if not backwards else more
+    return {
+        "rows": rows,
+        "next": encode_cursor("n", rows[-1]["created_at"], rows[-1]["id"]) if rows and has_next else None,
+        "prev": encode_cursor("p", rows[0]["created_at"], rows[0]["id"]) if rows and has_prev else None,
+    }
+
+
+def _drop_partition(day: str):
+    path = partition_path(day)
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _delete_before(table: str, cutoff: str, extra: str = "") -> int:
+    deleted = 0
+    while True:
+        with connection() as conn:
+            n = conn.execute(f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM {table} WHERE created_at < ?{extra}
+                    ORDER BY created_at, id LIMIT ?)
+            """, (cutoff, DELETE_BATCH)).rowcount
+        deleted += n
+        if n:
+            cache.bump(table)
+        if n < DELETE_BATCH:
+            return deleted
+        time.sleep(0)
+
+
+def apply_retention(cfg: dict = None) -> dict:
+    cfg = cfg or load_config()
+    now = datetime.now(timezone.utc)
+    result = {}
+    hours = float(cfg.get("retention_packets_hours", 24) or 0)
+    if hours:
+        cutoff = now - timedelta(hours=hours)
+        dropped = [d for d in list_partitions()
+                   if datetime.fromisoformat(d).replace(tzinfo=timezone.utc) + timedelta(days=1) <= cutoff]
+        for day in dropped:
+            _drop_partition(day)
+        legacy = _delete_before("packets", cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+        result["packets"] = {"partitions_dropped": dropped, "rows_deleted": legacy}
+    for table, (key, extra) in RETENTION.items():
+        days = float(cfg.get(key, 0) or 0)
+        if days:
+            cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+            result[table] = {"rows_deleted": _delete_before(table, cutoff, extra)}
+    return result
+
+
+def run_maintenance() -> dict:
+    _maintenance_status["running"] = True
+    try:
+        result = apply_retention()
+        _maintenance_status["last_result"] = result
+        _maintenance_status["last_run"] = datetime.now(timezone.utc).isoformat()
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        _maintenance_status["running"] = False
+
+
+def start_maintenance():
+    global _maintenance_thread
+    if _maintenance_thread and _maintenance_thread.is_alive():
+        return
+
+    def _loop():
+        while True:
+            run_maintenance()
+            time.sleep(max(1.0, float(load_config().get("retention_interval_minutes", 60))) * 60)
+
+    _maintenance_thread = threading.Thread(target=_loop, daemon=True)
+    _maintenance_thread.start()
+
+
+def storage_status() -> dict:
+    days = list_partitions()
+    sizes = {}
+    for d in days:
+        try:
+            sizes[d] = os.path.getsize(partition_path(d))
+        except OSError:
+            pass
+    return {"partitions": sizes, "maintenance": dict(_maintenance_status)}
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+from modules import events
+from modules.auth import verify_stream_ticket
+
+MAX_CLIENTS = 5000
+CLIENT_QUEUE = 500
+HEADER_LIMIT = 8192
+HEADER_TIMEOUT = 10
+
+# Dedicated event-stream listener: one asyncio task per client instead of a WSGI request
+# thread, so open dashboards never starve the API. Runs in the process that owns the bus.
+_server = {"port": None, "error": None}
+_clients = {}
+_stats = {"clients": 0, "served": 0, "rejected": 0, "overflows": 0}
+_loop = None
+
+
+def _response(writer, status: str, body: str = ""):
+    writer.write((f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+                  f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n{body}").encode())
+
+
+async def _handle(reader, writer):
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        writer.close()
+        return
+    lines = head.decode("latin-1").split("\r\n")
+    method, target = (lines[0].split(" ") + ["", ""])[:2]
+    headers = {k.strip().lower(): v.strip() for k, _, v in (ln.partition(":") for ln in lines[1:] if ln)}
+    url = urlsplit(target)
+    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+    if method != "GET" or url.path.rstrip("/") not in ("/stream", "/api/stream"):
+        _response(writer, "404 Not Found", "not found")
+    elif not verify_stream_ticket(query.get("ticket")):
+        _response(writer, "401 Unauthorized", "invalid or expired stream ticket")
+    elif len(_clients) >= MAX_CLIENTS:
+        _stats["rejected"] += 1
+        _response(writer, "503 Service Unavailable", "too many streams")
+    else:
+        await _serve(writer, headers.get("last-event-id") or query.get("last_id"),
+                     set(filter(None, query.get("types", "").split(","))))
+    try:
+        await writer.drain()
+        writer.close()
+    except ConnectionError:
+        pass
+
+
+async def _serve(writer, last_id, kinds: set):
+    inbox = asyncio.Queue(CLIENT_QUEUE)
+    _clients[writer] = inbox
+    _stats["clients"] = len(_clients)
+    _stats["served"] += 1
+    try:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Access-Control-Allow-Origin: *\r\nX-Accel-Buffering: no\r\n\r\n")
+        writer.write(f"retry: {events.RELAY_RETRY * 1000}\n\n".encode())
+        for event in events.backlog(int(last_id) if last_id and last_id.isdigit() else None):
+            inbox.put_nowait(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(inbox.get(), events.KEEPALIVE)
+            except asyncio.TimeoutError:
+                writer.write(b": keepalive\n\n")
+            else:
+                if not kinds or event[1] in kinds or event[1] == "resync":
+                    writer.write(events.format_sse(event).encode())
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        _clients.pop(writer, None)
+        _stats["clients"] = len(_clients)
+
+
+def _fanout(batch: list[tuple]):
+    for inbox in list(_clients.values()):
+        for event in batch:
+            try:
+                inbox.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop what the client has not read yet and tell it to reload.
+                while not inbox.empty():
+                    inbox.get_nowait()
+                inbox.put_nowait((event[0], "resync", {}))
+                _stats["overflows"] += 1
+                break
+
+
+def _bridge():
+    sub = events.subscribe()
+    while True:
+        batch = sub.get()
+        if batch and _clients:
+            _loop.call_soon_threadsafe(_fanout, batch)
+
+
+def start_stream_server(host: str, port: int) -> int | None:
+    """Start the listener in a background thread; returns the bound port (None if it failed)."""
+    if _server["port"] or not port:
+        return _server["port"]
+    ready = threading.Event()
+
+    def _run():
+        global _loop
+        _loop = asyncio.new_event_loop()
+        try:
+            server = _loop.run_until_complete(asyncio.start_server(_handle, host, port, limit=HEADER_LIMIT))
+        except OSError as e:
+            _server["error"] = str(e)
+            ready.set()
+            return
+        _server["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        _loop.run_forever()
+
+    threading.Thread(target=_run, daemon=True).start()
+    ready.wait(5)
+    if _server["port"]:
+        threading.Thread(target=_bridge, daemon=True).start()
+    return _server["port"]
+
+
+def stream_status() -> dict:
+    return {**_server, **_stats}
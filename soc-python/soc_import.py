@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+from modules.database import init_db
+from modules.log_analysis import bulk_import_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SOC Platform — bulk log import")
+    parser.add_argument("path", help="Log file or directory of archived logs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  SOC PLATFORM — Bulk Log Import")
+    print("=" * 50)
+    init_db()
+    print(f"  Importing {args.path} with {args.workers} workers")
+
+    def on_file(r):
+        if "error" in r:
+            print(f"  ! {r['file']}: {r['error']}")
+        else:
+            rate = r["total"] / r["seconds"] if r["seconds"] else r["total"]
+            print(f"  {r['file']}: {r['indexed']:,} indexed, {r['errors']:,} errors "
+                  f"in {r['seconds']}s ({rate:,.0f} rec/s)")
+
+    started = time.monotonic()
+    results = bulk_import_dir(args.path, workers=args.workers,
+                              recursive=not args.no_recursive, on_file=on_file)
+    elapsed = time.monotonic() - started
+    indexed = sum(r.get("indexed", 0) for r in results)
+    errors = sum(r.get("errors", 0) for r in results)
+    print("=" * 50)
+    print(f"  {len(results)} files, {indexed:,} records indexed, {errors:,} errors in {elapsed:.1f}s")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 import os
+import sys
 import argparse
+import subprocess
 from flask import Flask
-from modules.database import init_db
+from modules.database import init_db, rebuild_fts, check_query_plans
+from modules.storage import apply_retention, start_maintenance
+from modules.scanner import start_scheduler
 from modules.config import load_config, BASE_DIR
+from modules.control import ROLE, serve_control
+from modules.stream import start_stream_server
 from modules.routes import api
 from modules.ui import ui
 
 
 def create_app() -> Flask:
+    if ROLE == "api":
+        init_db()
     app = Flask(__name__, template_folder="templates", static_folder="static")
     cfg = load_config()
     app.secret_key = cfg["secret_key"]
@@ -17,25 +25,101 @@ def create_app() -> Flask:
     return app
 
 
+def serve_gunicorn(app: Flask, args):
+    """Launcher keeps capture/scanner here and forks API workers that call back over localhost."""
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        raise SystemExit("  gunicorn is not installed (pip install gunicorn)")
+    control = serve_control(app)
+    print(f"  Background services on http://127.0.0.1:{control.port}")
+    env = {**os.environ, "SOC_ROLE": "api", "SOC_CONTROL_URL": f"http://127.0.0.1:{control.port}"}
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"{args.host}:{args.port}",
+           "--workers", str(args.workers), "--threads", str(args.threads),
+           "--worker-class", "gthread", "--timeout", "120", "soc_platform:create_app()"]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env)
+    try:
+        raise SystemExit(proc.wait())
+    except KeyboardInterrupt:
+        proc.terminate()
+        proc.wait()
+    finally:
+        control.shutdown()
+
+
+def serve_waitress(app: Flask, args):
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("  waitress is not installed (pip install waitress)")
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
 def main():
     parser = argparse.ArgumentParser(description="SOC Platform")
     parser.add_argument("--host", default="0.0.0.0", help="Bind address")
     parser.add_argument("--port", type=int, default=5000, help="Port")
     parser.add_argument("--debug", action="store_true", help="Debug mode")
+    parser.add_argument("--server", choices=("dev", "waitress", "gunicorn"), default="dev",
+                        help="dev: Flask server; waitress: threaded WSGI, one process; "
+                             "gunicorn: --workers API processes, background services in the launcher")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="gunicorn API worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="Request threads per worker")
+    parser.add_argument("--stream-port", type=int, default=None,
+                        help="Port of the event-stream server (default: config stream_port, 0 disables)")
+    parser.add_argument("--rebuild-fts", action="store_true", help="Rebuild the log search index and exit")
+    parser.add_argument("--check-query-plans", action="store_true",
+                        help="Fail if a hot query falls back to a full table scan")
+    parser.add_argument("--apply-retention", action="store_true", help="Delete data past its retention and exit")
     args = parser.parse_args()
 
+    if args.check_query_plans:
+        init_db()
+        problems = check_query_plans()
+        for name, details in problems.items():
+            print(f"  {name}: {'; '.join(details)}")
+        print(f"  {len(problems)} hot queries without index support")
+        raise SystemExit(1 if problems else 0)
+
+    if args.apply_retention:
+        init_db()
+        for table, result in apply_retention().items():
+            print(f"  {table}: {result}")
+        return
+
+    if args.rebuild_fts:
+        init_db()
+        print("  Rebuilding log full-text index...")
+        rebuild_fts()
+        print("  Done.")
+        return
+
     print("=" * 50)
     print("  SOC PLATFORM — Python Edition")
     print("=" * 50)
     print(f"  Initialising database...")
     init_db()
     print(f"  Database ready: data/soc.db")
-    print(f"  Starting web server on http://{args.host}:{args.port}")
+    start_maintenance()
+    start_scheduler()
+    # Only a quarter of the request threads may be pinned by fallback /api/stream connections.
+    os.environ["SOC_STREAM_SLOTS"] = str(max(1, args.threads // 4))
+    stream_port = args.stream_port if args.stream_port is not None else int(load_config().get("stream_port", 5001))
+    if stream_port:
+        bound = start_stream_server(args.host, stream_port)
+        print(f"  Event stream on port {bound}" if bound else "  Event stream server failed to start; "
+              "clients fall back to /api/stream and polling")
+    print(f"  Starting {args.server} server on http://{args.host}:{args.port}")
     print(f"  Default login: admin / admin123")
     print("=" * 50)
 
     app = create_app()
-    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
+    if args.server == "gunicorn":
+        serve_gunicorn(app, args)
+    elif args.server == "waitress":
+        serve_waitress(app, args)
+    else:
+        app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+import argparse
+from modules.database import init_db
+from modules.pcap import replay_pcap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SOC Platform — PCAP replay")
+    parser.add_argument("pcap", help=".pcap or .pcapng file")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the capture's original pace")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pace multiplier for --realtime")
+    parser.add_argument("--no-store", action="store_true", help="Run detections without saving packets")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("  SOC PLATFORM — PCAP Replay")
+    print("=" * 50)
+    init_db()
+    print(f"  Replaying {args.pcap}" + (f" at {args.speed}x real time" if args.realtime else ""))
+
+    r = replay_pcap(args.pcap, realtime=args.realtime, speed=args.speed, store_packets=not args.no_store)
+    if "error" in r:
+        print(f"  ! {r['error']}")
+        raise SystemExit(1)
+    print("=" * 50)
+    print(f"  {r['packets']:,} packets ({r['decoded']:,} IPv4) in {r['seconds']}s "
+          f"— {r['pps']:,} pps, {r['mbps']} Mbit/s")
+    print(f"  {r['alerts']:,} rule hits")
+    for rule_id, count in r["alerts_by_rule"].items():
+        print(f"    {rule_id}: {count:,}")
+    print("  Stage timings (s): " + ", ".join(f"{k} {v}" for k, v in r["stages"].items()))
+    w = r["writer"]
+    print(f"  Writer: {w['written']:,} written, {w['dropped']:,} dropped, {w['failed']:,} failed")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import config, database  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point config, database and storage at an empty data directory."""
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "CONFIG_PATH", str(tmp_path / "config.json"))
+    monkeypatch.setattr(config, "_config_cache", None)
+    monkeypatch.setattr(database, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "soc.db"))
+    _close_pool()
+    yield tmp_path
+    _close_pool()
+
+
+def _close_pool():
+    with database._pool_cond:
+        for conn in database._pool_idle:
+            conn.close()
+        database._pool_stats["open"] -= len(database._pool_idle)
+        database._pool_idle.clear()
@@ -0,0 +1,32 @@
+from modules import auth, config, database
+
+
+def _limits(ip, user):
+    config.save_config({**config.load_config(),
+                        "login_attempts_per_minute_ip": ip, "login_attempts_per_minute_user": user})
+
+
+def test_user_bucket(data_dir):
+    database.init_db()
+    _limits(100, 3)
+    assert [auth.check_login_rate("admin", "10.0.0.1") for _ in range(3)] == [0.0] * 3
+    assert auth.check_login_rate("ADMIN", "10.0.0.2") > 0
+    assert auth.check_login_rate("alice", "10.0.0.1") == 0.0
+
+
+def test_ip_bucket(data_dir):
+    database.init_db()
+    _limits(2, 100)
+    assert auth.check_login_rate("a", "10.0.0.1") == 0.0
+    assert auth.check_login_rate("b", "10.0.0.1") == 0.0
+    assert auth.check_login_rate("c", "10.0.0.1") > 0
+    assert auth.check_login_rate("c", "10.0.0.9") == 0.0
+
+
+def test_buckets_are_shared_through_the_database(data_dir):
+    database.init_db()
+    _limits(100, 2)
+    auth.check_login_rate("admin", "10.0.0.1")
+    with database.connection() as conn:
+        conn.execute("UPDATE login_throttle SET tokens = 0 WHERE key = 'user:admin'")
+    assert auth.check_login_rate("admin", "10.0.0.1") > 0
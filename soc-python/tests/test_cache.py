@@ -0,0 +1,40 @@
+import time
+import pytest
+from flask import Flask, jsonify
+from modules import cache
+
+
+@pytest.fixture
+def client(data_dir, monkeypatch):
+    monkeypatch.setattr(cache, "_entries", cache.OrderedDict())
+    app = Flask(__name__)
+    calls = []
+
+    @app.route("/alerts")
+    @cache.cached("alerts", ttl=0.05)
+    def alerts():
+        calls.append(1)
+        return jsonify({"calls": len(calls)})
+
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def test_etag_is_stable_until_a_write(client):
+    etag = client.get("/alerts").headers["ETag"]
+    time.sleep(0.1)
+    assert client.get("/alerts", headers={"If-None-Match": etag}).status_code == 304
+
+    cache.bump("alerts")
+    resp = client.get("/alerts", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_body_expires_after_ttl(client):
+    client.get("/alerts")
+    client.get("/alerts")
+    assert len(client.calls) == 1
+    time.sleep(0.1)
+    assert client.get("/alerts").json == {"calls": 2}
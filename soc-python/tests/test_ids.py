@@ -0,0 +1,94 @@
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from modules import database, ids
+
+RULE = next(r for r in ids.IDS_RULES if r["id"] == "R003")
+
+
+@pytest.fixture
+def alerts(data_dir, monkeypatch):
+    database.init_db()
+    monkeypatch.setattr(ids, "_alert_window", 60.0)
+    monkeypatch.setattr(ids, "_alert_agg", OrderedDict())
+    monkeypatch.setattr(ids, "_agg_evicted", [])
+    monkeypatch.setattr(ids, "_flow_retry", [])
+    monkeypatch.setattr(ids, "_send_alert_notification", lambda rule, pkt_info: None)
+
+
+def _hit(now):
+    pkt = {"timestamp": datetime.fromtimestamp(now, timezone.utc).isoformat(), "protocol": "TCP",
+           "src_ip": "10.0.0.9", "dst_ip": "10.0.0.1", "src_port": 40000, "dst_port": 23}
+    ids._save_alert(pkt, RULE, now)
+
+
+def _rows():
+    with database.connection() as conn:
+        return [tuple(r) for r in conn.execute("SELECT id, status, count FROM alerts ORDER BY id")]
+
+
+def test_repeat_hits_are_aggregated(alerts):
+    for i in range(5):
+        _hit(1000 + i)
+    ids._flush_alert_counts()
+    assert _rows() == [(1, "open", 5)]
+
+
+def test_closed_alert_is_not_reused(alerts):
+    for i in range(3):
+        _hit(1000 + i)
+    ids.update_alert_status(1, "closed")
+    for i in range(4):
+        _hit(1010 + i)
+    ids._flush_alert_counts()
+    assert _rows() == [(1, "closed", 3), (2, "open", 4)]
+
+
+def test_pending_hits_survive_window_expiry(alerts):
+    _hit(1000)
+    for i in range(4):
+        _hit(1001 + i)
+    _hit(1100)
+    ids._flush_alert_counts()
+    assert _rows() == [(1, "open", 5), (2, "open", 1)]
+
+
+def _broken_connection():
+    raise sqlite3.OperationalError("database is locked")
+
+
+def test_failed_count_flush_is_retried(alerts, monkeypatch):
+    for i in range(3):
+        _hit(1000 + i)
+    monkeypatch.setattr(ids, "connection", _broken_connection)
+    errors = ids._writer_stats["flush_errors"]
+    ids._flush_alert_counts()
+    assert ids._writer_stats["flush_errors"] == errors + 1
+    assert "database is locked" in ids._writer_stats["last_error"]
+
+    monkeypatch.setattr(ids, "connection", database.connection)
+    _hit(1003)
+    ids._flush_alert_counts()
+    assert _rows() == [(1, "open", 4)]
+
+
+def test_failed_flow_export_is_retried(alerts, monkeypatch):
+    expired = [[("flow-1",), ("flow-2",)]]
+    monkeypatch.setattr(ids._flows, "expire", lambda force=False: expired.pop() if expired else [])
+    monkeypatch.setattr(ids, "connection", _broken_connection)
+    ids._flush_flows(force=True)
+    assert ids._writer_stats["flows_pending"] == 2
+
+    exported = []
+
+    @contextmanager
+    def recording_connection():
+        yield SimpleNamespace(executemany=lambda sql, batch: exported.extend(batch))
+
+    monkeypatch.setattr(ids, "connection", recording_connection)
+    ids._flush_flows(force=True)
+    assert exported == [("flow-1",), ("flow-2",)]
+    assert ids._writer_stats["flows_pending"] == 0
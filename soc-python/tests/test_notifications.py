@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+from modules import config, notifications
+from modules.ratelimit import TokenBucket
+
+
+class StubAPI(ThreadingHTTPServer):
+    """Records every POST and answers with the next scripted status (200 once the script runs out)."""
+
+    def __init__(self, statuses=()):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.statuses = list(statuses)
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.requests.append({"path": self.path, "headers": dict(self.headers),
+                                     "body": body, "at": time.monotonic()})
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        payload = json.dumps({"ok": status < 300}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(data_dir, monkeypatch):
+    servers = []
+
+    def start(statuses=()):
+        server = StubAPI(statuses)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(notifications, "TELEGRAM_API", server.url)
+        monkeypatch.setattr(notifications, "TWILIO_API", server.url)
+        return server
+
+    monkeypatch.setattr(notifications, "_channels", {})
+    monkeypatch.setattr(notifications, "_clients", {})
+    monkeypatch.setattr(notifications, "RETRY_BACKOFF", 0.01)
+    config.save_config({**config.load_config(),
+                        "telegram_token": "T0KEN", "telegram_chat_id": "42", "telegram_min_severity": "high",
+                        "twilio_sid": "AC1", "twilio_token": "secret", "twilio_from": "whatsapp:+1",
+                        "twilio_to": "whatsapp:+2", "whatsapp_min_severity": "critical"})
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _stats(name):
+    return notifications.dispatcher_status()[name]
+
+
+def test_delivers_to_both_channels(stub):
+    server = stub()
+    notifications.send_alert("Port scan", "critical", "from 10.0.0.9")
+    assert _wait(lambda: _stats("telegram")["sent"] == 1 and _stats("whatsapp")["sent"] == 1)
+
+    telegram = next(r for r in server.requests if r["path"].startswith("/botT0KEN/"))
+    assert telegram["path"] == "/botT0KEN/sendMessage"
+    assert json.loads(telegram["body"])["chat_id"] == "42"
+
+    whatsapp = next(r for r in server.requests if r["path"].startswith("/2010-04-01/"))
+    assert whatsapp["path"] == "/2010-04-01/Accounts/AC1/Messages.json"
+    assert parse_qs(whatsapp["body"].decode())["To"] == ["whatsapp:+2"]
+    assert whatsapp["headers"]["Authorization"].startswith("Basic ")
+
+
+def test_severity_threshold(stub):
+    server = stub()
+    notifications.send_alert("Odd login", "high", "x")
+    assert _wait(lambda: _stats("telegram")["sent"] == 1)
+    assert "whatsapp" not in notifications.dispatcher_status()
+    assert len(server.requests) == 1
+
+
+def test_retries_on_5xx_and_429(stub):
+    server = stub([500, 429, 503])
+    notifications._enqueue("telegram", "hello")
+    assert _wait(lambda: _stats("telegram")["sent"] == 1)
+    assert _stats("telegram")["retries"] == 3
+    assert len(server.requests) == 4
+
+
+def test_gives_up_after_max_attempts(stub):
+    server = stub([500] * notifications.MAX_ATTEMPTS)
+    notifications._enqueue("telegram", "hello")
+    assert _wait(lambda: _stats("telegram")["failed"] == 1)
+    assert _stats("telegram")["sent"] == 0
+    assert len(server.requests) == notifications.MAX_ATTEMPTS
+
+
+def test_client_errors_are_not_retried(stub):
+    server = stub([400])
+    notifications._enqueue("telegram", "hello")
+    assert _wait(lambda: _stats("telegram")["failed"] == 1)
+    assert len(server.requests) == 1
+    assert _stats("telegram")["last_error"] == "HTTP 400"
+
+
+def test_rate_limited(stub):
+    server = stub()
+    notifications._channel("telegram")["bucket"] = TokenBucket(10, 1)
+    for i in range(4):
+        notifications._enqueue("telegram", f"msg {i}")
+    assert _wait(lambda: _stats("telegram")["sent"] == 4)
+    times = [r["at"] for r in server.requests]
+    assert times[-1] - times[0] >= 0.25
+
+
+def test_sender_exception_keeps_channel_alive(stub, monkeypatch):
+    server = stub()
+    real = notifications.SENDERS["telegram"]
+    calls = []
+
+    def flaky(message, cfg):
+        calls.append(message)
+        if len(calls) == 1:
+            raise KeyError("chat_id")
+        return real(message, cfg)
+
+    monkeypatch.setitem(notifications.SENDERS, "telegram", flaky)
+    notifications._enqueue("telegram", "first")
+    assert _wait(lambda: _stats("telegram")["failed"] == 1)
+    notifications._enqueue("telegram", "second")
+    assert _wait(lambda: _stats("telegram")["sent"] == 1)
+    assert _stats("telegram")["running"]
+    assert len(server.requests) == 1
@@ -0,0 +1,34 @@
+import struct
+import pytest
+from modules import pcap
+
+
+def _block(block_type, body):
+    body += b"\0" * (-len(body) % 4)
+    length = len(body) + 12
+    return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+
+def _pcapng(tmp_path, iface):
+    frame = b"\0" * 14
+    shb = _block(0x0A0D0D0A, struct.pack("<IHHq", pcap.PCAPNG_BYTE_ORDER, 1, 0, -1))
+    idb = _block(1, struct.pack("<HHI", 1, 0, 65535))
+    epb = _block(6, struct.pack("<IIIII", iface, 0, 1_000_000, len(frame), len(frame)) + frame)
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(shb + idb + epb)
+    return str(path)
+
+
+def test_reads_enhanced_packet_block(tmp_path):
+    [(ts, frame, linktype, origlen)] = list(pcap.iter_pcap(_pcapng(tmp_path, 0)))
+    assert (ts, len(frame), linktype, origlen) == (1.0, 14, 1, 14)
+
+
+def test_undefined_interface_is_reported(tmp_path):
+    with pytest.raises(ValueError):
+        list(pcap.iter_pcap(_pcapng(tmp_path, 3)))
+
+
+def test_replay_reports_malformed_file(data_dir):
+    result = pcap.replay_pcap(_pcapng(data_dir, 3), store_packets=False)
+    assert "undefined interface 3" in result["error"]
@@ -0,0 +1,14 @@
+from modules import database
+
+
+def test_hot_queries_use_indexes(data_dir):
+    database.init_db()
+    assert database.check_query_plans() == {}
+
+
+def test_migrations_are_idempotent(data_dir):
+    database.init_db()
+    database.init_db()
+    with database.connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(database.MIGRATIONS)
@@ -0,0 +1,43 @@
+import socket
+import threading
+import time
+import httpx
+from modules import auth, events, stream
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_stream_server(data_dir):
+    port = stream.start_stream_server("127.0.0.1", _free_port())
+    assert port
+    url = f"http://127.0.0.1:{port}/stream"
+    assert httpx.get(url, params={"ticket": "bogus"}).status_code == 401
+    # A regular session token is not a stream ticket.
+    login = auth.generate_token(1, "admin", "admin")
+    assert httpx.get(url, params={"ticket": login}).status_code == 401
+    ticket = auth.generate_stream_ticket(auth.decode_token(login))
+    assert auth.verify_stream_ticket(ticket)["username"] == "admin"
+
+    received = []
+
+    def read():
+        with httpx.stream("GET", url, params={"ticket": ticket, "types": "alert"}, timeout=10) as r:
+            received.append(r.status_code)
+            for line in r.iter_lines():
+                if line.startswith("data:"):
+                    received.append(line)
+                    return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    deadline = time.monotonic() + 5
+    while stream.stream_status()["clients"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    events.publish("logs", {"filename": "skipped by the types filter"})
+    events.publish("alert", {"id": 7})
+    reader.join(10)
+    assert received == [200, 'data: {"id": 7}']